@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Support for main functions defined with async def.
+
+call() runs the coroutine returned by such a function on an event loop of its own until it is done.
+A job of the GUI runs on a thread of its own, so its loop runs alongside the tkinter thread and all
+other jobs. Within the coroutine, print, the log and progress.current() are routed by context variables,
+which asyncio copies into every task, and never wait for the GUI.
+Use procstream.run_async to run subprocesses without blocking the loop.
+'''
+
+import types
+
+###############################################################################
+
+
+def call(func, *args, **kwargs):
+    result = func(*args, **kwargs)
+    if isinstance(result, types.CoroutineType):
+        # asyncio is only imported for coroutine functions
+        import asyncio
+        return asyncio.run(result)
+    return result
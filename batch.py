@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Batch execution of a main function over the rows of a manifest.
+
+A manifest is either a CSV file with the parameter names as header or a JSON lines file
+(.jsonl, .ndjson) with one object per row. Values are given as on the command line,
+multiple arguments separated by commas or as a list in JSON, options without arguments as true or false.
+Missing values are replaced by the default of the parameter.
+
+Every row is validated with the verify functions of the parameters before the main function is called
+for the valid rows on a pool of threads or processes. With processes the main function has to be
+importable by name and its output goes to the console of the child process instead of the log.
+'''
+
+import os
+import csv
+import json
+import functools
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+from .parameter import Parameter
+from .capture import bind
+from .asyncmain import call
+
+###############################################################################
+
+MODE = 'batch'
+TRUE_VALUES = ['1', 'true', 'yes', 'on', 'x']
+
+
+class RowResult:
+
+    def __init__(self, index, row, args=None, value=None, error=None):
+        self.index = index
+        self.row = row
+        self.args = args
+        self.value = value
+        self.error = error
+
+    @property
+    def failed(self):
+        return self.error is not None
+
+
+def read_manifest(path):
+    if os.path.splitext(path)[1].lower() in ['.jsonl', '.ndjson']:
+        with open(path, encoding='utf-8') as manifest:
+            return [json.loads(line) for line in manifest if line.strip()]
+    with open(path, newline='', encoding='utf-8') as manifest:
+        return list(csv.DictReader(manifest))
+
+
+def verify_row(parameters, verifiers, row):
+    unknown = set(row) - set([parameter.name for parameter in parameters])
+    if unknown:
+        raise ValueError("unknown parameters %s" % ', '.join(sorted(unknown)))
+
+    args = {}
+    for parameter in parameters:
+        value = row.get(parameter.name)
+        verify_func = verifiers[parameter.name]
+        if value is None or value == '':
+            # like argparse, a default given as string is validated as if it was passed,
+            # and a flag without a default is False as with store_true
+            value = parameter.default
+            if parameter.nargs == 0:
+                value = False if value is None else value
+            elif isinstance(value, str):
+                value = verify_func(value)
+        elif parameter.nargs == 0:
+            value = value if isinstance(value, bool) else str(value).strip().lower() in TRUE_VALUES
+        elif parameter.nargs in [1, '?']:
+            value = verify_func(value)
+        else:
+            values = value if isinstance(value, list) else [item.strip() for item in value.split(',')]
+            value = parameter.verify_list(verify_func, values)
+        args[parameter.name] = value
+    return args
+
+
+def run_batch(main_function, parameters, verifiers, manifest, workers=4, processes=False, progress=None):
+    '''Validate all rows of the manifest and call main_function for the valid ones.
+
+    verifiers maps the parameter names to their verify functions. progress is called with
+    the number of finished and of all rows. Returns a list of RowResult in the order of the rows.
+    '''
+    rows = read_manifest(manifest)
+    results = []
+    for index, row in enumerate(rows):
+        try:
+            results.append(RowResult(index, row, verify_row(parameters, verifiers, row)))
+        except Exception as e:
+            results.append(RowResult(index, row, error=str(e)))
+
+    done = len([result for result in results if result.failed])
+    if progress is not None:
+        progress(done, len(results))
+
+    executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor_class(max_workers=max(1, workers)) as executor:
+        # rows run in threads write to the log of the job running the batch,
+        # a coroutine main runs on a loop of its own per row
+        func = functools.partial(call, main_function)
+        if not processes:
+            func = bind(func)
+        futures = {}
+        for result in results:
+            if not result.failed:
+                futures[executor.submit(func, **result.args)] = result
+        for future in as_completed(futures):
+            result = futures[future]
+            try:
+                result.value = future.result()
+            except Exception as e:
+                result.error = '%s: %s' % (type(e).__name__, e)
+            done += 1
+            if progress is not None:
+                progress(done, len(results))
+
+    return results
+
+
+def print_summary(results):
+    failed = [result for result in results if result.failed]
+    for result in failed:
+        print("row %d failed: %s" % (result.index + 1, result.error))
+    print("batch done: %d rows, %d succeeded, %d failed" % (len(results), len(results) - len(failed), len(failed)))
+
+
+def pop_arguments(argv, reserved=()):
+    '''Remove the batch arguments from argv and return the manifest, the workers and whether to use processes.
+
+    The manifest is None if no "--batch" argument is given.
+    Flags in reserved belong to the parameters of the script and are left alone.
+    '''
+    from .cliparser import pop_options
+    found = pop_options(argv, {'--batch': 1, '--batch-workers': 1, '--batch-processes': 0}, reserved)
+    workers = found.get('--batch-workers', '4')
+    if not workers.isdigit():
+        raise ValueError("argument --batch-workers: %r is no number" % workers)
+    return found.get('--batch'), int(workers), '--batch-processes' in found
+
+
+def is_manifest(value):
+    if not os.path.isfile(value):
+        raise ValueError("%r is no file" % value)
+    return os.path.abspath(value)
+
+
+def is_workers(value):
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError("%r is no positive number" % value)
+    return int(value)
+
+
+def gui_parameters():
+    # parameters of the additional mode in the GUI that runs a manifest
+    return [Parameter(name='manifest', verify=is_manifest, widget='file',
+                      help='CSV or JSON lines file with one row of parameters per run'),
+            Parameter(name='workers', default='4', verify=is_workers,
+                      help='number of runs at the same time'),
+            Parameter(name='processes', nargs=0, default=False,
+                      help='run in processes instead of threads')]
@@ -0,0 +1,774 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Benchmarks for the hot paths of the generic user interface.
+
+Every benchmark runs without a display and reports its throughput next to the target it has to reach.
+The GUI is built from stand-ins for the tkinter widgets, which accept every call and do nothing,
+so the time spent in this package is measured apart from the time spent drawing.
+With "--tk" the form is built with the real tkinter instead, with "--xvfb" on a virtual display started for it.
+
+The results can be saved as baselines with "--save" and every later run fails for a result that got
+more than "--threshold" (by default 25%) worse than its baseline, besides failing for a missed target.
+
+The parser benchmark also checks that the fast path of the compiled parser returns the same values
+as argparse for random command lines, and fails at the first one that differs.
+
+Run it from the directory containing this package with "python -m <package>.benchmark [options]".
+'''
+
+import os
+import sys
+import json
+import time
+import types
+import shutil
+import threading
+import subprocess
+from collections import OrderedDict
+from contextlib import contextmanager, ExitStack
+
+from .logpipe import LogPipe
+from .parameter import Parameter
+from .cliparser import CompiledParser, compile_parser
+
+###############################################################################
+
+# lines per second the log pipeline has to move from print calls into the log widget
+LOG_TARGET_LINES_PER_SECOND = 250000
+# the same through GenericGUI.log and flush_log, which also write every line to the history file of the tab
+GUI_LOG_TARGET_LINES_PER_SECOND = 200000
+# megabytes per second the log pipeline has to split into lines, with and without line breaks
+ASSEMBLY_TARGET_MB_PER_SECOND = 50
+# megabytes per second of subprocess output catch_subprocess_output has to move into the log
+SUBPROCESS_TARGET_MB_PER_SECOND = 50
+# milliseconds the imports of a command line run may take, as measured by python -X importtime
+STARTUP_IMPORT_TARGET_MS = 50
+# milliseconds a command line run may take in total from interpreter start to exit
+STARTUP_TOTAL_TARGET_MS = 150
+
+# how many times faster a warm parse has to be than building and running argparse each time
+PARSER_TARGET_SPEEDUP = 10
+# percent of the random command lines accepted by argparse that the fast path of the parser has to take over
+PARITY_TARGET_FAST_PERCENT = 75
+# milliseconds load_cli may take to compile its parser and parse a command line, plus microseconds per parameter
+LOAD_CLI_TARGET_MS = 2
+LOAD_CLI_TARGET_US_PER_PARAMETER = 50
+# values per second the verification of a parameter has to get through, also when argparse has to parse them
+VERIFY_TARGET_VALUES_PER_SECOND = 20000
+ARGPARSE_TARGET_VALUES_PER_SECOND = 2000
+# milliseconds verify_items may take beyond the timeouts of the values, when they never return
+STUCK_TARGET_MS = 200
+# milliseconds init_ui may take to show the first mode, and microseconds per row of a form built in full
+INIT_UI_TARGET_MS = 20
+BUILD_TARGET_US_PER_ROW = 500
+
+# relative change of a result, compared to its baseline, that counts as regression
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baselines.json')
+
+# script for a fresh interpreter that imports the module and parses its arguments
+STARTUP_SCRIPT = '''
+import sys
+try:
+    from {package}.genui import GenericUI, Parameter
+    sys.argv = ['tool'] + {argv!r}
+    parameters = [Parameter(name='value', verify=lambda value: value),
+                  Parameter(name='flag', long='flag', nargs=0, default=False)]
+    GenericUI(parameters, lambda value, flag: None).run()
+finally:
+    sys.stderr.write('gui modules: %r\\n' % [name for name in ('tkinter', 'psutil') if name in sys.modules])
+'''
+
+# script for a subprocess that writes megabytes of lines to stdout and every sixteenth line to stderr
+OUTPUT_SCRIPT = '''
+import sys
+line = b'x' * ({line_length} - 1) + b'\\n'
+for _ in range({chunks}):
+    sys.stdout.buffer.write(line * 15)
+    sys.stderr.buffer.write(line)
+'''
+
+
+# tkinter stand-ins ###########################################################
+
+
+class StandIn:
+    '''Stand-in for any tkinter widget, variable or style, that accepts every call and counts it.'''
+
+    calls = 0
+    created = 0
+
+    def __init__(self, master=None, *args, **kwargs):
+        StandIn.calls += 1
+        StandIn.created += 1
+        self.master = master
+        self.value = kwargs.get('value')
+        self.path = '.' if master is None else '%s.!standin%d' % (str(master).rstrip('.'), StandIn.created)
+
+    def __str__(self):
+        return self.path
+
+    def noop(self, *args, **kwargs):
+        StandIn.calls += 1
+
+    pack = pack_forget = grid = grid_rowconfigure = grid_columnconfigure = place = noop
+    configure = config = bind = bind_all = unbind = noop
+    title = resizable = protocol = minsize = geometry = wm_title = withdraw = deiconify = lift = noop
+    mainloop = quit = destroy = tkraise = focus = noop
+    insert = delete = select = add = forget = create_window = yview_scroll = after_cancel = noop
+    itemconfig = selection_clear = selection_set = noop
+
+    def after(self, *args, **kwargs):
+        StandIn.calls += 1
+        return 'after#'
+
+    after_idle = after
+
+    def yview(self, *args):
+        StandIn.calls += 1
+        return (0.0, 1.0)
+
+    def nearest(self, y):
+        return 0
+
+    def winfo_reqwidth(self):
+        return 1
+
+    def bbox(self, *args):
+        return None
+
+    def get(self, *args):
+        return self.value
+
+    def set(self, value, *args):
+        self.value = value
+
+
+def stand_in_modules():
+    # namespaces replacing tkinter and tkinter.ttk in the modules of the GUI
+    import tkinter
+    import tkinter.constants
+    tk = types.SimpleNamespace(**{name: getattr(tkinter.constants, name) for name in dir(tkinter.constants)
+                                  if name.isupper()})
+    tk.TclError = tkinter.TclError
+    for name in ['Tk', 'Toplevel', 'Canvas', 'Listbox', 'StringVar', 'BooleanVar', 'IntVar']:
+        setattr(tk, name, StandIn)
+    ttk = types.SimpleNamespace(**{name: StandIn for name in ['Style', 'Frame', 'Label', 'Entry', 'Button',
+                                                              'Checkbutton', 'Scrollbar', 'OptionMenu',
+                                                              'Notebook', 'Progressbar']})
+    return tk, ttk
+
+
+@contextmanager
+def tk_stand_ins(enabled=True):
+    from . import gengui, logview
+    if not enabled:
+        yield
+        return
+    tk, ttk = stand_in_modules()
+    saved = [(module, module.tk, module.ttk) for module in [gengui, logview]]
+    try:
+        for module, _, _ in saved:
+            module.tk = tk
+            module.ttk = ttk
+        yield
+    finally:
+        for module, module_tk, module_ttk in saved:
+            module.tk = module_tk
+            module.ttk = module_ttk
+
+
+def timed_gui_class():
+    from .gengui import GenericGUI
+
+    class TimedGUI(GenericGUI):
+        # closes itself once the first mode is shown, after timing how long that and the rest of the form took
+
+        def init_ui(self):
+            start = time.perf_counter()
+            GenericGUI.init_ui(self)
+            self.init_time = time.perf_counter() - start
+            self.build_time = None
+            self.root_window.after_idle(self.close_timed)
+            if type(self.root_window) is StandIn:
+                # the stand-in has no event loop to run the callback
+                self.close_timed()
+
+        def close_timed(self):
+            mode = list(self.parameters.keys())[0]
+            start = time.perf_counter()
+            self.build_rows(mode)
+            self.build_time = time.perf_counter() - start
+            self.on_quit()
+            if type(self.root_window) is not StandIn:
+                self.root_window.destroy()
+
+    return TimedGUI
+
+
+def form_parameters(count, modes=1):
+    # a form with all kinds of widgets in turn
+    widgets = ['text', 'file', 'dir', 'fileordir', 'pass', 'box']
+    parameters = OrderedDict()
+    for mode in range(modes):
+        parameters['mode %d' % mode] = [Parameter(name='bench_%d' % i, widget=widgets[i % len(widgets)],
+                                                  nargs=0 if widgets[i % len(widgets)] == 'box' else 1)
+                                        for i in range(count)]
+    return parameters
+
+
+def create_gui(parameters):
+    # a GUI built and closed again, its log pipeline is still usable with the stand-ins
+    from . import gengui
+    # the widgets of a form are class attributes, which would pile up from one GUI to the next
+    gengui.GenericGUI.entries = {}
+    gengui.GenericGUI.input_frames = {}
+    gui = timed_gui_class()('benchmark', parameters)
+    gui.join()
+    if gui.build_time is None:
+        raise AssertionError("the GUI was closed before its form was built")
+    return gui
+
+
+# benchmarks ##################################################################
+
+
+class FakeListbox:
+    '''Stand-in for tk.Listbox that records the calls made by GenericGUI.flush_log.'''
+
+    def __init__(self):
+        self.lines = []
+        self.calls = 0
+
+    def insert(self, index, *lines):
+        self.calls += 1
+        self.lines.extend(lines)
+
+    def delete(self, index):
+        self.calls += 1
+        self.lines.pop()
+
+    def yview(self, index):
+        self.calls += 1
+
+
+def apply_log(listbox, replace_last, lines):
+    if lines:
+        if replace_last:
+            listbox.delete('end')
+        listbox.insert('end', *lines)
+        listbox.yview('end')
+
+
+def bench_log(count=200000, frame=0.033, runs=3):
+    expected = count - (count + 9) // 10 + (1 if (count - 1) % 10 == 0 else 0)
+    # the best of a few runs, as a single one depends on how the threads happen to be scheduled
+    times = []
+    for _ in range(runs):
+        pipe = LogPipe()
+        listbox = FakeListbox()
+
+        # write like print does from a worker thread, every tenth line being a progress line
+        def writer():
+            for i in range(count):
+                pipe.write("message #%d" % i)
+                pipe.write('\r' if i % 10 == 0 else '\n')
+
+        start = time.perf_counter()
+        thread = threading.Thread(target=writer)
+        thread.start()
+        while thread.is_alive():
+            time.sleep(frame)
+            apply_log(listbox, *pipe.drain())
+        apply_log(listbox, *pipe.drain())
+        times.append(time.perf_counter() - start)
+
+        if len(listbox.lines) != expected:
+            raise AssertionError("log holds %d lines instead of %d" % (len(listbox.lines), expected))
+
+    return {'name': 'log', 'unit': 'lines/s', 'value': count / min(times),
+            'target': LOG_TARGET_LINES_PER_SECOND, 'tk_calls': listbox.calls}
+
+
+def bench_gui_log(count=200000, frame=0.033, runs=3):
+    from .jobs import Job
+    from .gengui import JobTab
+
+    expected = count - (count + 9) // 10 + (1 if (count - 1) % 10 == 0 else 0)
+    times = []
+    # GenericGUI.log to the newest tab and flush_log at the frame rate of the GUI, the best of a few runs
+    with tk_stand_ins():
+        gui = create_gui(form_parameters(1))
+        for run in range(runs):
+            tab = JobTab(StandIn(gui.root_window), Job(run + 1, 'bench', {}), gui.log_ring_size, gui.tabs.remove)
+            gui.tabs.append(tab)
+            StandIn.calls = 0
+
+            # write like print does from a worker thread, every tenth line being a progress line
+            def writer():
+                for i in range(count):
+                    gui.log("message #%d" % i)
+                    gui.log('\r' if i % 10 == 0 else '\n')
+
+            start = time.perf_counter()
+            thread = threading.Thread(target=writer)
+            thread.start()
+            while thread.is_alive():
+                time.sleep(frame)
+                gui.flush_log()
+            gui.flush_log()
+            times.append(time.perf_counter() - start)
+            shown = tab.log_view.history.count
+            tab.close()
+
+            if shown != expected:
+                raise AssertionError("log holds %d lines instead of %d" % (shown, expected))
+
+    return {'name': 'gui log', 'unit': 'lines/s', 'value': count / min(times),
+            'target': GUI_LOG_TARGET_LINES_PER_SECOND, 'detail': "%d tkinter calls" % StandIn.calls}
+
+
+def bench_log_assembly(megabytes=8, line_length=80, piece_size=1024):
+    line = 'x' * (line_length - 1) + '\n'
+    text = line * (megabytes * 1024 * 1024 // line_length)
+    results = []
+
+    # one large write with embedded line breaks
+    pipe = LogPipe()
+    start = time.perf_counter()
+    pipe.write(text)
+    replace_last, lines = pipe.drain()
+    elapsed = time.perf_counter() - start
+    if len(lines) != text.count('\n'):
+        raise AssertionError("split %d lines instead of %d" % (len(lines), text.count('\n')))
+    results.append({'name': 'log split', 'unit': 'MB/s', 'value': megabytes / elapsed,
+                    'target': ASSEMBLY_TARGET_MB_PER_SECOND})
+
+    # many small writes without any line break, capped at the default partial line length
+    pipe = LogPipe()
+    piece = 'y' * piece_size
+    start = time.perf_counter()
+    for _ in range(megabytes * 1024 * 1024 // piece_size):
+        pipe.write(piece)
+    pipe.write('\n')
+    replace_last, lines = pipe.drain()
+    elapsed = time.perf_counter() - start
+    if sum(len(line) for line in lines) != megabytes * 1024 * 1024:
+        raise AssertionError("partial lines lost characters")
+    results.append({'name': 'log unterminated', 'unit': 'MB/s', 'value': megabytes / elapsed,
+                    'target': ASSEMBLY_TARGET_MB_PER_SECOND})
+
+    return results
+
+
+def bench_subprocess_output(megabytes=32, line_length=80):
+    chunks = megabytes * 1024 * 1024 // (line_length * 16)
+    script = OUTPUT_SCRIPT.format(line_length=line_length, chunks=chunks)
+
+    with tk_stand_ins():
+        gui = create_gui(form_parameters(1))
+        start = time.perf_counter()
+        process_handle = subprocess.Popen([sys.executable, '-c', script], stdout=subprocess.PIPE,
+                                          stderr=subprocess.PIPE)
+        returncode = gui.catch_subprocess_output(process_handle)
+        replace_last, lines = gui.log_pipe.drain()
+        elapsed = time.perf_counter() - start
+
+    if returncode != 0 or len(lines) != chunks * 16:
+        raise AssertionError("caught %d lines instead of %d" % (len(lines), chunks * 16))
+    return {'name': 'subprocess output', 'unit': 'MB/s', 'value': megabytes / elapsed,
+            'target': SUBPROCESS_TARGET_MB_PER_SECOND}
+
+
+def bench_init_ui(counts=(10, 100, 1000), stand_ins=True):
+    results = []
+    with tk_stand_ins(stand_ins):
+        for count in counts:
+            # the best of a few runs, as the first one also pays for imports
+            init_times = []
+            build_times = []
+            for _ in range(3 if count < 1000 else 1):
+                gui = create_gui(form_parameters(count, modes=2))
+                init_times.append(gui.init_time)
+                build_times.append(gui.build_time)
+
+            rows = count - min(count, gui.scroll_rows)
+            results.append({'name': 'init_ui %d rows' % count, 'unit': 'ms', 'value': min(init_times) * 1000,
+                            'target': INIT_UI_TARGET_MS, 'lower': True})
+            if rows:
+                results.append({'name': 'form %d rows built' % count, 'unit': 'us/row',
+                                'value': min(build_times) * 1000000 / rows, 'target': BUILD_TARGET_US_PER_ROW,
+                                'lower': True})
+    return results
+
+
+def bench_startup(argv, runs=7):
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    script = STARTUP_SCRIPT.format(package=__package__, argv=argv)
+    command = [sys.executable, '-X', 'importtime', '-c', script]
+
+    totals = []
+    imports = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        process = subprocess.run(command, cwd=os.path.dirname(package_dir), stdout=subprocess.DEVNULL,
+                                 stderr=subprocess.PIPE, universal_newlines=True)
+        totals.append((time.perf_counter() - start) * 1000)
+        if process.returncode not in [0, 2] or 'Traceback' in process.stderr:
+            raise AssertionError("command line run of %r failed:\n%s" % (argv, process.stderr))
+
+        # sum up the cumulative time of all top level imports, given in microseconds
+        cumulative = 0
+        for line in process.stderr.splitlines():
+            if line.startswith('import time:') and not line.split('|')[2].startswith('  '):
+                fields = line.split('|')
+                if fields[1].strip().isdigit():
+                    cumulative += int(fields[1])
+            elif line.startswith('gui modules:') and line != 'gui modules: []':
+                raise AssertionError("command line run of %r imported %s" % (argv, line))
+        imports.append(cumulative / 1000)
+
+    # the fastest run is the one least disturbed by the rest of the system
+    name = 'startup ' + ' '.join(argv)
+    return [{'name': name + ' imports', 'unit': 'ms', 'value': min(imports),
+             'target': STARTUP_IMPORT_TARGET_MS, 'lower': True},
+            {'name': name + ' total', 'unit': 'ms', 'value': min(totals),
+             'target': STARTUP_TOTAL_TARGET_MS, 'lower': True}]
+
+
+def cli_parameters(count, verify=lambda value: value):
+    # options and positionals in equal parts, as tools with many modes expose them
+    parameters = []
+    argv = []
+    for i in range(count):
+        if i % 2:
+            parameters.append(Parameter(name='bench_option_%d' % i, long='bench-option-%d' % i,
+                                        verify=verify, help='option %d' % i))
+            argv.extend(['--bench-option-%d' % i, '%d' % i])
+        else:
+            parameters.append(Parameter(name='bench_value_%d' % i, verify=verify))
+            argv.append('%d' % i)
+    return parameters, argv
+
+
+def release_flags(prefixes=('--bench-option-',)):
+    for name in Parameter.used_flags.copy():
+        if name.startswith(prefixes):
+            Parameter.used_flags.remove(name)
+
+
+def parity_parameters():
+    # every kind of nargs the fast path handles, for positionals and for options, with and without defaults
+    to_int = lambda value: int(value)
+    return [Parameter(name='parity_source'),
+            Parameter(name='parity_pair', nargs=2, verify=to_int, workers=1),
+            Parameter(name='parity_count', short='Q', long='parity-count', default='3', verify=to_int),
+            Parameter(name='parity_name', long='parity-name', nargs='?'),
+            Parameter(name='parity_items', long='parity-items', nargs='+', verify=to_int, workers=1),
+            Parameter(name='parity_extra', long='parity-extra', nargs='*', workers=1),
+            Parameter(name='parity_size', long='parity-size', nargs=2, verify=to_int, workers=1),
+            Parameter(name='parity_quiet', long='parity_quiet', nargs=0),
+            Parameter(name='parity_loud', long='parity_loud', nargs=0, default=True)]
+
+
+# pieces of the random command lines, and rarely those only argparse handles or that fail to verify
+PARITY_FLAGS = ['-Q', '--parity-count', '--parity-name', '--parity-items', '--parity-extra', '--parity-size',
+                '--parity_quiet', '--parity_loud']
+PARITY_VALUES = ['1', '2', '7', '42']
+PARITY_ODD = ['--parity-c', '-Q5', '--parity-count=4', 'x', 'a.txt', '-1', '--']
+
+
+def parity_command_line(generator, odd=0.03):
+    # options with a random number of values each and the positionals in one or two places between them
+    def pick(tokens):
+        return generator.choice(PARITY_ODD if generator.random() < odd else tokens)
+
+    groups = [[pick(PARITY_FLAGS)] + [pick(PARITY_VALUES) for _ in range(generator.randint(0, 3))]
+              for _ in range(generator.randint(0, 4))]
+    positionals = [pick(PARITY_VALUES) for _ in range(generator.randint(2, 4))]
+    split = generator.randint(0, len(positionals))
+    groups.insert(generator.randint(0, len(groups)), positionals[:split])
+    groups.insert(generator.randint(0, len(groups)), positionals[split:])
+    return [token for group in groups for token in group]
+
+
+def bench_parser_parity(lines=3000, seed=1):
+    import io
+    import random
+    from contextlib import redirect_stderr
+
+    parameters = parity_parameters()
+    fast = CompiledParser(parameters)
+    slow = CompiledParser(parameters)
+    slow.fast = False
+    generator = random.Random(seed)
+    valid = taken = 0
+    try:
+        for _ in range(lines):
+            argv = parity_command_line(generator)
+            try:
+                values = fast.parse_fast(argv)
+            except Exception:
+                # parse falls back to argparse, which reports the error
+                values = None
+            try:
+                with redirect_stderr(io.StringIO()):
+                    expected = slow.parse(argv)
+                valid += 1
+            except SystemExit:
+                expected = "an error"
+            if values is None:
+                continue
+            taken += 1
+            if values != expected:
+                raise AssertionError("the fast path parses %r to %r instead of %r" % (argv, values, expected))
+    finally:
+        release_flags(('-Q', '--parity'))
+
+    return {'name': 'parser parity', 'unit': '% fast', 'value': 100.0 * taken / max(1, valid),
+            'target': PARITY_TARGET_FAST_PERCENT,
+            'detail': "%d random command lines, %d valid, all parsed as argparse does" % (lines, valid)}
+
+
+def bench_cli_parser(count=300, runs=20):
+    parameters, argv = cli_parameters(count)
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        cold = vars(CompiledParser(parameters).parser.parse_args(argv))
+    cold_time = (time.perf_counter() - start) / runs
+
+    compile_parser(parameters)
+    start = time.perf_counter()
+    for _ in range(runs):
+        warm = compile_parser(parameters).parse(argv)
+    warm_time = (time.perf_counter() - start) / runs
+
+    release_flags()
+    if cold != warm:
+        raise AssertionError("warm parse differs from argparse")
+
+    return {'name': 'parser speedup', 'unit': 'x', 'value': cold_time / warm_time, 'target': PARSER_TARGET_SPEEDUP,
+            'detail': "%d parameters, warm %.2f ms, cold %.2f ms" % (count, warm_time * 1000, cold_time * 1000)}
+
+
+def bench_load_cli(counts=(10, 100, 1000), runs=10):
+    from .genui import GenericUI
+    results = []
+    saved_argv = sys.argv
+    try:
+        for count in counts:
+            parameters, argv = cli_parameters(count)
+            received = []
+            ui = GenericUI(parameters, lambda **args: received.append(args))
+            sys.argv = ['tool'] + argv
+
+            # the first call compiles the parser, the later ones find it cached
+            start = time.perf_counter()
+            ui.load_cli()
+            cold_time = time.perf_counter() - start
+            start = time.perf_counter()
+            for _ in range(runs):
+                sys.argv = ['tool'] + argv
+                ui.load_cli()
+            warm_time = (time.perf_counter() - start) / runs
+            release_flags()
+
+            if len(received) != runs + 1 or len(received[-1]) != count:
+                raise AssertionError("main got %d calls instead of %d" % (len(received), runs + 1))
+            target = LOAD_CLI_TARGET_MS + count * LOAD_CLI_TARGET_US_PER_PARAMETER / 1000
+            results.append({'name': 'load_cli %d parameters' % count, 'unit': 'ms', 'value': cold_time * 1000,
+                            'target': target, 'lower': True, 'detail': "later calls %.2f ms" % (warm_time * 1000)})
+    finally:
+        sys.argv = saved_argv
+    return results
+
+
+def bench_verify(count=20000):
+    from .genui import list_wrap
+    results = []
+
+    # the comma separated values of a GUI entry, verified in parallel by list_wrap
+    for workers in [1, 8]:
+        parameter = Parameter(name='bench_list', nargs='+', verify=lambda value: int(value), workers=workers)
+        verify = list_wrap(parameter.cached(parameter.verify), parameter)
+        text = ','.join(['%d' % i for i in range(count)])
+        start = time.perf_counter()
+        values = verify(text)
+        elapsed = time.perf_counter() - start
+        if values != list(range(count)):
+            raise AssertionError("list_wrap returned wrong values")
+        results.append({'name': 'verify list %d workers' % workers, 'unit': 'values/s', 'value': count / elapsed,
+                        'target': VERIFY_TARGET_VALUES_PER_SECOND})
+
+    # the values of options verified by argparse through error_wrap
+    parameters, argv = cli_parameters(200, lambda value: int(value))
+    parser = CompiledParser(parameters).parser
+    runs = max(1, count // 200)
+    start = time.perf_counter()
+    for _ in range(runs):
+        args = vars(parser.parse_args(argv))
+    elapsed = time.perf_counter() - start
+    release_flags()
+    if args['bench_option_1'] != 1:
+        raise AssertionError("argparse returned wrong values")
+    results.append({'name': 'verify argparse', 'unit': 'values/s', 'value': runs * 200 / elapsed,
+                    'target': ARGPARSE_TARGET_VALUES_PER_SECOND})
+    return results
+
+
+def bench_verify_stuck(stuck=3, workers=2, timeout=0.2):
+    from .validation import verify_items
+    # values that never return, like those on a stalled mount, take every worker and more
+    released = threading.Event()
+
+    def verify(value):
+        if value.startswith('stuck'):
+            released.wait()
+        return value
+
+    values = ['stuck %d' % i for i in range(stuck)] + ['fine']
+    start = time.perf_counter()
+    try:
+        verify_items(verify, values, workers, timeout)
+    except ValueError as e:
+        message = str(e)
+    else:
+        message = ''
+    elapsed = time.perf_counter() - start
+    released.set()
+
+    if message.count("took longer") != stuck:
+        raise AssertionError("verify_items reported %r for %d stuck values" % (message, stuck))
+    # every round of workers waits for the timeout once
+    rounds = -(-stuck // workers)
+    return {'name': 'verify stuck workers', 'unit': 'ms', 'value': (elapsed - rounds * timeout) * 1000,
+            'target': STUCK_TARGET_MS, 'lower': True,
+            'detail': "%d values stuck on %d workers, %.2f s" % (stuck, workers, elapsed)}
+
+
+# baselines ###################################################################
+
+
+def load_baselines(path):
+    if not os.path.isfile(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baselines(path, results):
+    baselines = load_baselines(path)
+    for result in results:
+        baselines[result['name']] = {'value': result['value'], 'unit': result['unit']}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare(result, baselines, threshold):
+    # relative change against the baseline, positive for better, or None without a baseline
+    baseline = baselines.get(result['name'])
+    if baseline is None or baseline['unit'] != result['unit'] or not baseline['value']:
+        return None
+    change = result['value'] / baseline['value'] - 1
+    return -change if result.get('lower') else change
+
+
+def report(result, baselines, threshold):
+    if result.get('lower'):
+        passed = result['value'] <= result['target']
+    else:
+        passed = result['value'] >= result['target']
+    status = 'ok' if passed else 'TOO SLOW'
+
+    change = compare(result, baselines, threshold)
+    if change is not None:
+        if change < -threshold:
+            passed = False
+            status += ', REGRESSED'
+        status = '%+4.0f%% %s' % (change * 100, status)
+
+    print("%-28s %14.1f %-8s (target %g) %s" % (result['name'], result['value'], result['unit'],
+                                                result['target'], status))
+    if 'detail' in result:
+        print("%-28s %s" % ('', result['detail']))
+    return passed
+
+
+@contextmanager
+def virtual_display():
+    # start Xvfb on a free display number for the real tkinter
+    if shutil.which('Xvfb') is None:
+        raise ValueError("Xvfb is not installed")
+    for number in range(99, 199):
+        if not os.path.exists('/tmp/.X11-unix/X%d' % number) and not os.path.exists('/tmp/.X%d-lock' % number):
+            break
+    process = subprocess.Popen(['Xvfb', ':%d' % number, '-screen', '0', '1280x1024x24'],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    saved = os.environ.get('DISPLAY')
+    os.environ['DISPLAY'] = ':%d' % number
+    try:
+        # wait for the server to accept connections
+        deadline = time.monotonic() + 5
+        while not os.path.exists('/tmp/.X11-unix/X%d' % number) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        yield
+    finally:
+        process.terminate()
+        process.wait()
+        if saved is None:
+            del os.environ['DISPLAY']
+        else:
+            os.environ['DISPLAY'] = saved
+
+
+BENCHMARKS = OrderedDict([
+    ('log', lambda options: [bench_log(), bench_gui_log()] + bench_log_assembly()),
+    ('subprocess', lambda options: [bench_subprocess_output()]),
+    ('init_ui', lambda options: bench_init_ui(stand_ins=not options.tk)),
+    ('startup', lambda options: bench_startup(['--help']) + bench_startup(['x'])),
+    ('parser', lambda options: [bench_parser_parity(), bench_cli_parser()] + bench_load_cli()),
+    ('verify', lambda options: bench_verify() + [bench_verify_stuck()]),
+])
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="benchmarks of the hot paths of the generic user interface")
+    parser.add_argument('only', nargs='*', metavar='benchmark',
+                        help="benchmarks to run, out of %s, by default all" % ', '.join(BENCHMARKS))
+    parser.add_argument('--baselines', default=DEFAULT_BASELINES, help="file with the saved baselines")
+    parser.add_argument('--save', action='store_true', help="save the results as new baselines")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="relative change below the baseline that fails a result")
+    parser.add_argument('--tk', action='store_true', help="build the form with the real tkinter")
+    parser.add_argument('--xvfb', action='store_true', help="like --tk, on a virtual display started with Xvfb")
+    options = parser.parse_args()
+    options.tk = options.tk or options.xvfb
+    for name in options.only:
+        if name not in BENCHMARKS:
+            parser.error("there is no benchmark %r" % name)
+
+    with ExitStack() as stack:
+        if options.xvfb:
+            try:
+                stack.enter_context(virtual_display())
+            except ValueError as e:
+                parser.error(str(e))
+        results = []
+        for name, benchmark in BENCHMARKS.items():
+            if not options.only or name in options.only:
+                results.extend(benchmark(options))
+
+    baselines = {} if options.save else load_baselines(options.baselines)
+    passed = all([report(result, baselines, options.threshold) for result in results])
+    if options.save:
+        save_baselines(options.baselines, results)
+        print("saved the baselines to %s" % options.baselines)
+    return 0 if passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Routing of sys.stdout and sys.stderr to the sinks of the active job.
+
+install() replaces sys.stdout and sys.stderr by StreamRouter objects and returns a function
+that puts the original streams back. A router passes every write to the sinks set with redirect()
+for the current context, or to the original stream if there are none. The sinks are kept in a
+contextvars.ContextVar, so every thread and asyncio task writes to its own sinks without a lock
+and output of unrelated threads still goes to the console.
+
+New threads start with an empty context, so threads started by a job only write to its sinks
+if their function is wrapped with bind() in the thread of the job.
+'''
+
+import sys
+import contextvars
+from contextlib import contextmanager
+
+###############################################################################
+
+# tuple of the write functions for stdout and stderr, None outside of a redirect
+sinks = contextvars.ContextVar('sinks', default=None)
+
+
+class StreamRouter:
+
+    def __init__(self, stream, index):
+        self.stream = stream
+        self.index = index
+
+    def write(self, msg):
+        active = sinks.get()
+        if active is None:
+            return self.stream.write(msg)
+        return active[self.index](msg)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        if sinks.get() is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        # encoding, fileno, isatty and the like of the original stream
+        return getattr(self.stream, name)
+
+
+def install():
+    routers = StreamRouter(sys.stdout, 0), StreamRouter(sys.stderr, 1)
+    sys.stdout, sys.stderr = routers
+
+    def restore():
+        # leave streams alone that were replaced by someone else in the meantime
+        if sys.stdout is routers[0]:
+            sys.stdout = routers[0].stream
+        if sys.stderr is routers[1]:
+            sys.stderr = routers[1].stream
+    return restore
+
+
+@contextmanager
+def redirect(stdout, stderr=None):
+    # send the output of the current context to the write functions given
+    token = sinks.set((stdout, stderr or stdout))
+    try:
+        yield
+    finally:
+        sinks.reset(token)
+
+
+def bind(func):
+    # run func in the context of the caller, each call in a copy of its own as a context
+    # can't be entered by two threads at the same time
+    context = contextvars.copy_context()
+
+    def wrapped(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return wrapped
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Command line parser compiled once from a list of Parameter objects.
+
+compile_parser(parameters) turns the parameters into a CompiledParser and caches it in memory,
+keyed by the parameters themselves and their definitions, so repeated runs within a process skip its construction.
+CompiledParser.parse() first tries a fast path that covers plain command lines made of exact flags
+and positional values. Everything else, like help, abbreviated or unknown flags, '--', negative numbers
+and any error, falls back to the argparse.ArgumentParser, which is only built and imported when needed.
+Both ways return the same dictionary of parameter names and validated values.
+
+pop_options(argv, options, reserved) takes the options of the wrappers around main, like "--profile"
+or "--batch", out of argv before the parameters are parsed.
+'''
+
+import sys
+
+###############################################################################
+
+
+class Argument:
+
+    def __init__(self, parameter):
+        self.parameter = parameter
+        self.dest = parameter.name
+        self.nargs = parameter.nargs
+        self.verify = parameter.cached(parameter.verify)
+        self.identifiers = []
+        self.specifiers = {}
+
+        if not parameter.short and not parameter.long:
+            self.identifiers.append(parameter.name)
+        else:
+            if parameter.short is not None:
+                self.identifiers.append(parameter.short)
+            if parameter.long is not None:
+                self.identifiers.append(parameter.long)
+            self.specifiers['dest'] = parameter.name
+
+        if parameter.nargs != 1:
+            if parameter.nargs == 0:
+                self.specifiers['action'] = 'store_true' if not parameter.default else 'store_false'
+            else:
+                self.specifiers['nargs'] = parameter.nargs
+
+        if parameter.default is not None:
+            self.specifiers['default'] = parameter.default
+        if parameter.meta is not None:
+            self.specifiers['metavar'] = parameter.meta
+        if parameter.help is not None:
+            self.specifiers['help'] = parameter.help
+
+        self.positional = self.identifiers == [parameter.name]
+        self.action = self.specifiers.get('action')
+        # the values of a parameter with multiple arguments are verified together after parsing
+        self.multiple = self.action is None and parameter.nargs not in [1, '?']
+        if self.action is None:
+            self.default = self.specifiers.get('default')
+        else:
+            self.default = self.specifiers.get('default', self.action == 'store_false')
+
+    def verify_list(self, values):
+        return self.parameter.verify_list(self.verify, values)
+
+    def get_name(self):
+        if self.positional:
+            return self.specifiers.get('metavar', self.dest)
+        return '/'.join(self.identifiers)
+
+    def get_default(self):
+        # like argparse, a default given as string is validated as if it was passed
+        if self.action is None and isinstance(self.default, str):
+            return self.verify(self.default)
+        return self.default
+
+
+class CompiledParser:
+
+    def __init__(self, parameters):
+        self.arguments = [Argument(parameter) for parameter in parameters]
+        self.positionals = [argument for argument in self.arguments if argument.positional]
+        self.options = {}
+        for argument in self.arguments:
+            if not argument.positional:
+                for identifier in argument.identifiers:
+                    self.options[identifier] = argument
+
+        # the fast path assigns positionals only by a fixed number of values
+        self.fast = all([type(argument.nargs) is int and argument.nargs > 0 and argument.action is None
+                         for argument in self.positionals])
+        self.argparse_parser = None
+
+    @property
+    def parser(self):
+        if self.argparse_parser is None:
+            self.argparse_parser = self.build_parser()
+        return self.argparse_parser
+
+    def build_parser(self):
+        import argparse
+
+        def error_wrap(func):
+            # convert any exception of parameter.verify to the argparse exception
+            def wrapped(value):
+                try:
+                    return func(value)
+                except Exception as e:
+                    raise argparse.ArgumentTypeError(str(e))
+            return wrapped
+
+        parser = argparse.ArgumentParser()
+        for argument in self.arguments:
+            specifiers = dict(argument.specifiers)
+            if argument.action is None and not argument.multiple:
+                verify_func = argument.verify
+                if type(verify_func).__name__ != 'type':
+                    verify_func = error_wrap(verify_func)
+                specifiers['type'] = verify_func
+            parser.add_argument(*argument.identifiers, **specifiers)
+        return parser
+
+    def parse(self, argv=None):
+        argv = sys.argv[1:] if argv is None else list(argv)
+        if self.fast:
+            try:
+                args = self.parse_fast(argv)
+            except Exception:
+                # let argparse report the error in its own words
+                args = None
+            if args is not None:
+                return args
+
+        args = vars(self.parser.parse_args(argv))
+        for argument in self.arguments:
+            if not argument.multiple:
+                continue
+            value = args[argument.dest]
+            try:
+                if isinstance(value, list):
+                    args[argument.dest] = argument.verify_list(value)
+                elif isinstance(value, str):
+                    args[argument.dest] = argument.verify(value)
+            except Exception as e:
+                self.parser.error("argument %s: %s" % (argument.get_name(), e))
+        return args
+
+    def parse_fast(self, argv):
+        # returns None wherever argparse might behave differently than this simple parser
+        values = {}
+        chunks = [[]]
+        index = 0
+        while index < len(argv):
+            arg = argv[index]
+            index += 1
+            if not is_flag(arg):
+                chunks[-1].append(arg)
+                continue
+
+            argument = self.options.get(arg)
+            if argument is None:
+                return None
+            chunks.append([])
+            if argument.action is not None:
+                values[argument.dest] = argument.action == 'store_true'
+                continue
+
+            # number of values the flag takes, None for as many as there are
+            if argument.nargs in [1, '?']:
+                limit = 1
+            elif type(argument.nargs) is int:
+                limit = argument.nargs
+            else:
+                limit = None
+            taken = []
+            while index < len(argv) and not is_flag(argv[index]) and (limit is None or len(taken) < limit):
+                taken.append(argv[index])
+                index += 1
+
+            if argument.nargs == 1:
+                if not taken:
+                    return None
+                values[argument.dest] = argument.verify(taken[0])
+            elif argument.nargs == '?':
+                values[argument.dest] = argument.verify(taken[0]) if taken else None
+            else:
+                if len(taken) < (limit or 0) or argument.nargs == '+' and not taken:
+                    return None
+                values[argument.dest] = argument.verify_list(taken)
+
+        # positionals have to fit completely into the groups of values between the flags
+        positionals = iter(self.positionals)
+        argument = next(positionals, None)
+        for chunk in chunks:
+            while argument is not None and len(chunk) >= argument.nargs:
+                if argument.nargs == 1:
+                    values[argument.dest] = argument.verify(chunk[0])
+                else:
+                    values[argument.dest] = argument.verify_list(chunk[:argument.nargs])
+                chunk = chunk[argument.nargs:]
+                argument = next(positionals, None)
+            if chunk:
+                return None
+        if argument is not None:
+            return None
+
+        for argument in self.arguments:
+            if argument.dest not in values:
+                values[argument.dest] = argument.get_default()
+        return values
+
+
+def pop_options(argv, options, reserved=()):
+    '''Remove the given options from argv and return their values by flag.
+
+    options maps every flag to the number of values it takes: 0 for a switch, whose value is True,
+    1 for "--flag value" or "--flag=value" and '?' for "--flag" with the value None or "--flag=value".
+    Flags not given are missing in the result, the last of repeated flags wins. argv[0] and everything
+    after "--" is left alone, and so are the flags in reserved, which belong to the parameters of the script.
+    '''
+    found = {}
+    index = 1
+    while index < len(argv) and argv[index] != '--':
+        name, separator, value = argv[index].partition('=')
+        if name not in options or name in reserved:
+            index += 1
+            continue
+        del argv[index]
+        nargs = options[name]
+        if nargs == 0:
+            if separator:
+                raise ValueError("argument %s: ignored explicit argument %r" % (name, value))
+            value = True
+        elif separator:
+            if not value:
+                raise ValueError("argument %s: expected a value after '='" % name)
+        elif nargs == '?':
+            value = None
+        else:
+            if index >= len(argv) or argv[index] == '--':
+                raise ValueError("argument %s: expected one argument" % name)
+            value = argv.pop(index)
+        found[name] = value
+    return found
+
+
+def is_flag(arg):
+    return arg.startswith('-') and arg != '-'
+
+
+def definition_key(parameters):
+    # the arguments of the parser keep the parameter objects, which also carry the widget, workers, timeout
+    # and more for the verification, so only the same objects may share a parser
+    return tuple((id(parameter), parameter.name, parameter.short, parameter.long, parameter.meta, parameter.nargs,
+                  repr(parameter.default), parameter.help, parameter.verify) for parameter in parameters)
+
+
+compiled = {}
+
+
+def compile_parser(parameters):
+    key = definition_key(parameters)
+    if key not in compiled:
+        compiled[key] = CompiledParser(parameters)
+    return compiled[key]
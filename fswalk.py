@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Expansion of glob patterns for the values of file, dir and fileordir parameters.
+
+expand() resolves patterns like 'assets/**/*.png' with os.scandir, scanning the directories
+of different subtrees on a pool of threads. The type of each entry is taken from the directory listing,
+so no file is stat'ed to walk the tree, and each path found keeps its os.DirEntry, which caches
+the status of the file once it was asked for, see validation.get_state.
+
+Like glob, '**' matches any number of directories, names starting with '.' only match patterns
+starting with '.' and a pattern ending with a separator only matches directories, which are returned
+with the separator. Unlike glob, '**' doesn't follow links to directories, so a link can't make
+the walk run in circles, a link itself is still matched like any other entry,
+and a trailing '**' only matches what is below the directory it starts in, not that directory itself.
+
+A value that exists as it is, like 'report[1].txt', is taken literally and not as a pattern.
+
+A TreeIndex remembers the listing of every directory walked together with its modification time.
+Expanding a pattern again, e.g. on a re-run in the GUI, only lists the directories that changed since.
+'''
+
+import os
+import re
+import fnmatch
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+###############################################################################
+
+MAGIC = re.compile(r'[*?[]')
+RECURSIVE = '**'
+
+
+def has_magic(value):
+    return MAGIC.search(value) is not None
+
+
+class WalkedPath(str):
+    # a path found by the walker, with the os.DirEntry it was listed as or None
+    entry = None
+
+
+class TreeIndex:
+
+    def __init__(self):
+        self.listings = {}
+        self.lock = threading.Lock()
+
+    def list(self, directory):
+        try:
+            status = os.stat(directory)
+        except OSError:
+            return []
+        key = status.st_mtime_ns, status.st_ino
+        with self.lock:
+            cached = self.listings.get(directory)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        # the entries aren't kept, as their cached status would be outdated on the next expansion
+        listing = [(name, is_dir, is_link, None) for name, is_dir, is_link, entry in list_directory(directory)]
+        with self.lock:
+            self.listings[directory] = key, listing
+        return listing
+
+    def clear(self):
+        with self.lock:
+            self.listings.clear()
+
+
+def list_directory(directory):
+    # tuples of name, whether it is a directory, whether it is a link and the os.DirEntry
+    listing = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                    is_link = entry.is_symlink()
+                except OSError:
+                    continue
+                listing.append((entry.name, is_dir, is_link, entry))
+    except OSError:
+        pass
+    return listing
+
+
+def split_pattern(pattern):
+    # directory without any magic to start the walk from, the components of the pattern below it
+    # and whether it ends with a separator to only match directories
+    if os.altsep is not None:
+        pattern = pattern.replace(os.altsep, os.sep)
+    directories = pattern.endswith(os.sep)
+    parts = pattern.split(os.sep)
+    index = 0
+    while index < len(parts) and not has_magic(parts[index]):
+        index += 1
+    base = os.sep.join(parts[:index])
+    if index > 0 and (not base or base.endswith(':')):
+        # the root directory or the root of a drive
+        base += os.sep
+    return base, [part for part in parts[index:] if part], directories
+
+
+class Walker:
+
+    def __init__(self, pattern, kind=None, workers=8, index=None):
+        self.base, components, directories = split_pattern(pattern)
+        self.kind = kind
+        self.directories = directories
+        self.suffix = os.sep if directories else ''
+        self.workers = workers
+        self.list = index.list if index is not None else list_directory
+        # number of scans waiting for or running on a thread
+        self.queued = 0
+        self.components = []
+        for component in components:
+            if component == RECURSIVE:
+                matcher = None
+            else:
+                matcher = re.compile(fnmatch.translate(os.path.normcase(component))).match
+            self.components.append((component, matcher))
+
+    def expand(self):
+        if not self.components:
+            return [self.base] if os.path.lexists(self.base) else []
+
+        task = self.base or os.curdir, self.base, 0
+        if self.workers <= 1:
+            # nothing to hand back to
+            self.queued = self.workers
+            return sorted(set(self.scan([task])[0]))
+
+        matches = set()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = set([executor.submit(self.scan, [task])])
+            while pending:
+                self.queued = len(pending)
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    found, more = future.result()
+                    matches.update(found)
+                    pending.update([executor.submit(self.scan, [task]) for task in more])
+        return sorted(matches)
+
+    def scan(self, stack):
+        # walk the subtrees depth first and hand them back to other threads while some of those are idle
+        found = []
+        while stack:
+            directory, display, index = stack.pop()
+            self.match(self.list(directory), directory, display, index, found, stack)
+            if len(stack) > 1 and self.queued < self.workers:
+                return found, stack
+        return found, []
+
+    def match(self, listing, directory, display, index, found, more):
+        component, matcher = self.components[index]
+        last = index == len(self.components) - 1
+
+        if matcher is None:
+            if last:
+                # a trailing '**' matches everything below
+                for name, is_dir, is_link, entry in listing:
+                    if not name.startswith('.'):
+                        self.add(found, os.path.join(display, name), is_dir, entry)
+            else:
+                # '**' matching no directory at all
+                self.match(listing, directory, display, index + 1, found, more)
+            for name, is_dir, is_link, entry in listing:
+                if is_dir and not is_link and not name.startswith('.'):
+                    more.append((os.path.join(directory, name), os.path.join(display, name), index))
+            return
+
+        hidden = component.startswith('.')
+        for name, is_dir, is_link, entry in listing:
+            if name.startswith('.') and not hidden or not matcher(os.path.normcase(name)):
+                continue
+            if last:
+                self.add(found, os.path.join(display, name), is_dir, entry)
+            elif is_dir:
+                more.append((os.path.join(directory, name), os.path.join(display, name), index + 1))
+
+    def add(self, found, path, is_dir, entry):
+        if self.kind == 'file' and is_dir or (self.kind == 'dir' or self.directories) and not is_dir:
+            return
+        path = WalkedPath(path + self.suffix)
+        path.entry = entry
+        found.append(path)
+
+
+def expand(pattern, kind=None, workers=8, index=None):
+    '''Return the sorted paths matching the glob pattern.
+
+    kind 'file' or 'dir' only keeps files or directories. index is a TreeIndex to reuse listings.
+    '''
+    return Walker(pattern, kind, workers, index).expand()
+
+
+def expand_values(values, widget, workers=8, index=None):
+    # replace the patterns among the values of a parameter by the paths of the kind of its widget
+    kind = widget if widget in ['file', 'dir'] else None
+    expanded = []
+    for value in values:
+        if not isinstance(value, str) or not has_magic(value) or os.path.lexists(value):
+            expanded.append(value)
+            continue
+        paths = expand(value, kind, workers, index)
+        if not paths:
+            raise ValueError("no %s matches %r" % (kind or 'path', value))
+        expanded.extend(paths)
+    return expanded
@@ -3,8 +3,8 @@
 
 '''Generic graphical user interface for input parameters and output log as plug-in to any python program.
 
-It spawns a thread that blocks the main application until the user entered the required parameters
-and logs all output of the application to a separate window during execution.
+It spawns a thread that hands each set of parameters the user entered to the main application as a job
+and logs the output of every job to its own tab of a separate window during execution.
 
 usage:
     - specify the parameters you need from the user in an OrderedDict() with lists of Parameter objects
@@ -13,25 +13,51 @@ usage:
         ui = BasicUI(title, parameters)
     - different modes are switchable by the user, but only one can be launched
     - parameter types supported are 'dir', 'file', 'text', 'pass', 'box'
-    - to retrieve the parameters just read the parameters[ui.mode.get()][number].value.get()
-    - all print and logging messages are redirected to the ui log window
-    - use set_progress(percentage) to track progress in the progress bar
+    - get_input() waits for the next click on Run and returns a jobs.Job with mode and arguments,
+      or None once the window was closed
+    - all print and logging messages of a job are redirected to its tab in the ui log window,
+      use log(msg) to write to the newest tab from outside of a job
+    - the bar above the log of a tab searches it for words and filters it to errors, warnings
+      or the output to stderr, using an index that is built as the lines arrive, see the logindex module
+    - with profile=True a checkbox next to Run marks jobs to be profiled, see job.profile
+    - pass a started resources.ResourceMonitor to show the resources used in the log window
+    - use progress.current() in a job to report its progress, with items per second and remaining time,
+      in the progress bar and status line of its tab, or set_progress(percentage) for a plain percentage
+    - use catch_subprocess_output(process_handle) to stream the output of a subprocess to the log
+      or, in a main defined with async def, await run_subprocess(args) to do so without blocking
+    - output is queued by any thread and drained to the log window at a fixed frame rate
+    - the form of a mode is only built when the mode is selected first, long forms scroll
+      and build their rows as they come into view
+    - entries are validated in the background while typing, so a click on Run only validates what changed
 '''
 
 import sys
+import time
+import queue
 import threading
 
 import tkinter as tk
 import tkinter.ttk as ttk
 from tkinter import filedialog
 
-from collections import OrderedDict
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 
+from . import capture
+from .jobs import Job, current_job, RUNNING
+from .logpipe import LogPipe
+from .logview import LogView
+from .logindex import FILTERS
+from .procstream import OutputCapture, run_async
+from .resources import describe as describe_resources
 from .tktooltip import ToolTip
 from .parameter import Parameter
 
 ###############################################################################
 
+# mouse wheel on Windows and macOS and on X11
+WHEEL_EVENTS = ['<MouseWheel>', '<Button-4>', '<Button-5>']
+
 
 class GenericGUI(threading.Thread):
 
@@ -48,28 +74,57 @@ class GenericGUI(threading.Thread):
 
     root_window = None
     log_window = None
-
-    def __init__(self, title, parameters):
+    notebook = None
+
+    # milliseconds between two updates of the log window, about 30 frames per second
+    log_interval = 33
+    # number of lines held by the log window, older lines are paged in from disk
+    log_ring_size = 5000
+    # milliseconds without typing before an entry is validated and number of threads doing so
+    check_delay = 300
+    check_workers = 4
+    # modes with more parameters get a scrollable form of the given height in pixels,
+    # which builds that many rows at a time while scrolling down
+    scroll_rows = 20
+    scroll_height = 500
+
+    def __init__(self, title, parameters, monitor=None, profile=False):
         self.title = title
         self.parameters = parameters
-        self.event = threading.Event()
+        # outer frame of every mode built so far and number of its rows built
+        self.mode_frames = {}
+        self.built_rows = {}
+        self.form_canvases = {}
+        self.profile_toggle = profile
+        self.profile = None
+        self.monitor = monitor
+        self.monitor_label = None
+        self.monitor_sample = None
+        self.submissions = queue.Queue()
+        self.job_count = 0
+        self.tabs = []
+        # output written outside of any job
+        self.log_pipe = LogPipe()
+        self.checks = {}
+        self.check_results = deque()
+        self.check_executor = ThreadPoolExecutor(max_workers=self.check_workers)
 
         threading.Thread.__init__(self)
         self.start()
 
     def get_input(self):
-        self.event.clear()
-        self.event.wait()
+        # wait for the next job submitted by a click on Run, which is None once the window is closed
+        self.job = self.submissions.get()
+        return self.job
 
     def on_quit(self):
         self.should_quit = True
         self.root_window.quit()
-        self.event.set()
+        self.submissions.put(None)
 
     def on_log_quit(self):
-        self.log_window.destroy()
-        self.log_window = None
-        self.set_disabled(self.root_window, False)
+        # only hide the log window, the jobs keep running and writing to their tabs
+        self.log_window.withdraw()
 
     def run(self):
         self.root_window = tk.Tk()
@@ -78,6 +133,7 @@ class GenericGUI(threading.Thread):
 
         self.init_ui()
         if self.should_quit:
+            self.submissions.put(None)
             return
 
         self.root_window.title(self.title)
@@ -85,15 +141,15 @@ class GenericGUI(threading.Thread):
         self.root_window.protocol('WM_DELETE_WINDOW', self.on_quit)
         self.root_window.bind('<Escape>', self.on_quit)
 
-        old_stdout = sys.stdout
-        old_stderr = sys.stderr
-        sys.stdout.write = self.log
-        sys.stderr.write = self.log
-
-        self.root_window.mainloop()
-
-        sys.stdout = old_stdout
-        sys.stderr = old_stderr
+        # route the output of each job to its tab, output outside of jobs stays on the console
+        restore = capture.install()
+        try:
+            self.root_window.after(self.log_interval, self.flush_log)
+            self.root_window.after(self.log_interval, self.apply_checks)
+            self.root_window.mainloop()
+        finally:
+            self.check_executor.shutdown(wait=False)
+            restore()
 
     def init_ui(self):
         self.style = ttk.Style()
@@ -107,23 +163,32 @@ class GenericGUI(threading.Thread):
         frame.pack(fill=tk.BOTH, expand=True)
 
         # layout
-        container = ttk.Frame(frame, style="Custom.TFrame")
-        container.pack(fill=tk.BOTH, expand=True)
-        container.grid_rowconfigure(0, weight=1)
-        container.grid_columnconfigure(0, weight=1)
-
-        # stack frames for different modes with the first being on top
-        for key, values in reversed(list(self.parameters.items())):
-            self.input_frames[key] = ttk.Frame(container, style="Custom.TFrame")
-            self.input_frames[key].grid(row=0, column=0, sticky="nsew")
-            self.row_count = 0
+        self.container = ttk.Frame(frame, style="Custom.TFrame")
+        self.container.pack(fill=tk.BOTH, expand=True)
+        self.container.grid_rowconfigure(0, weight=1)
+        self.container.grid_columnconfigure(0, weight=1)
+
+        # the widgets of the other modes are only checked here, their frames are stacked
+        # in the container when they are selected first
+        for values in self.parameters.values():
             for param in values:
-                self.create_widget(key, param)
+                if param.widget not in self.help_text:
+                    print("ERROR: Only viable parameter types are 'file', 'dir', 'text', 'pass' and 'box'.")
+                    self.should_quit = True
+                    return
+        self.create_frame(list(self.parameters.keys())[0])
 
         launch_button = ttk.Button(frame, text="Run", command=self.confirm)
         launch_button.bind('<Return>', lambda event: self.confirm())
         launch_button.pack(side=tk.RIGHT, padx=5, pady=5)
 
+        if self.profile_toggle:
+            self.profile = tk.BooleanVar()
+            profile_box = ttk.Checkbutton(frame, text="profile", variable=self.profile, takefocus=False)
+            profile_box.pack(side=tk.LEFT, padx=5, pady=5)
+            ToolTip(profile_box, "run with cProfile and tracemalloc and write the results\n"
+                                 "to <script>-job<number>.pstats and .alloc in the working directory")
+
         # provide an option in case of multiple modes
         if len(self.parameters.keys()) > 1:
             drop_menu = ttk.OptionMenu(frame, self.mode, list(self.parameters.keys())[0], *self.parameters.keys(), command=self.change_frame)
@@ -154,6 +219,8 @@ class GenericGUI(threading.Thread):
         entry = self.entries[key][-1]
         entry.grid(row=self.row_count, column=1, padx=5, pady=5)
         entry.bind('<Button-1>', lambda event: self.handle_click(entry))
+        entry.bind('<KeyRelease>', lambda event: self.schedule_check(entry))
+        self.checks[entry] = EntryCheck(param)
 
         if param.widget == 'dir':
             button = ttk.Button(frame, text="Browse...", command=lambda: self.ask_directory(entry))
@@ -203,19 +270,137 @@ class GenericGUI(threading.Thread):
         dir_name = filedialog.askdirectory()
         if dir_name != "":
             self.set_entry(entry, dir_name)
+            self.schedule_check(entry)
         return
 
     def ask_file(self, entry):
         file_name = filedialog.askopenfilename()
         if file_name != "":
             self.set_entry(entry, file_name)
+            self.schedule_check(entry)
         return
 
+    def create_frame(self, key):
+        if len(self.parameters[key]) <= self.scroll_rows:
+            self.input_frames[key] = ttk.Frame(self.container, style="Custom.TFrame")
+            self.mode_frames[key] = self.input_frames[key]
+            self.mode_frames[key].grid(row=0, column=0, sticky="nsew")
+            self.build_rows(key)
+            return
+
+        outer = ttk.Frame(self.container, style="Custom.TFrame")
+        outer.grid(row=0, column=0, sticky="nsew")
+        canvas = tk.Canvas(outer, background='white', highlightthickness=0, height=self.scroll_height)
+        scrollbar = ttk.Scrollbar(outer, orient=tk.VERTICAL, command=canvas.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        canvas.configure(yscrollcommand=lambda first, last: self.on_form_scroll(key, scrollbar, first, last))
+
+        inner = ttk.Frame(canvas, style="Custom.TFrame")
+        canvas.create_window((0, 0), window=inner, anchor=tk.NW)
+        inner.bind('<Configure>', lambda event: canvas.configure(scrollregion=canvas.bbox(tk.ALL),
+                                                                 width=inner.winfo_reqwidth()))
+        if not self.form_canvases:
+            for sequence in WHEEL_EVENTS:
+                self.root_window.bind_all(sequence, self.on_form_wheel, add='+')
+
+        self.input_frames[key] = inner
+        self.mode_frames[key] = outer
+        self.form_canvases[key] = canvas
+        self.build_rows(key, self.scroll_rows)
+
+    def build_rows(self, key, count=None):
+        # build the next count rows of the form, or all rows that are still missing
+        params = self.parameters[key]
+        first = self.built_rows.get(key, 0)
+        last = len(params) if count is None else min(len(params), first + count)
+        self.row_count = first
+        for param in params[first:last]:
+            self.create_widget(key, param)
+        self.built_rows[key] = last
+
+    def on_form_scroll(self, key, scrollbar, first, last):
+        scrollbar.set(first, last)
+        # build more rows once the end of the built ones comes into view
+        if float(last) > 0.9 and self.built_rows[key] < len(self.parameters[key]):
+            self.build_rows(key, self.scroll_rows)
+
+    def on_form_wheel(self, event):
+        # scroll the form of the current mode while the pointer is above it
+        canvas = self.form_canvases.get(self.mode.get())
+        if canvas is None:
+            return
+        try:
+            widget = self.root_window.winfo_containing(event.x_root, event.y_root)
+        except KeyError:
+            # tkinter doesn't know some internal widgets, like the popdown of a menu
+            return
+        if widget is None or not str(widget).startswith(str(canvas)):
+            return
+        if event.num == 4 or event.delta > 0:
+            canvas.yview_scroll(-1, 'units')
+        else:
+            canvas.yview_scroll(1, 'units')
+
     def change_frame(self, mode):
-        if mode in self.input_frames.keys():
-            self.input_frames[mode].tkraise()
+        if mode not in self.mode_frames:
+            self.create_frame(mode)
+        self.mode_frames[mode].tkraise()
+
+    def schedule_check(self, entry):
+        # restart the delay with every key stroke, so only the final text gets validated
+        check = self.checks[entry]
+        if check.timer is not None:
+            self.root_window.after_cancel(check.timer)
+        check.timer = self.root_window.after(self.check_delay, self.start_check, entry)
+
+    def start_check(self, entry):
+        check = self.checks[entry]
+        check.timer = None
+        check.generation += 1
+        if check.future is not None:
+            check.future.cancel()
+
+        text = entry.get()
+        if text in self.help_text.values():
+            check.future = None
+            return
+        check.future = self.check_executor.submit(self.run_check, entry, check.param, text, check.generation)
+
+    def run_check(self, entry, param, text, generation):
+        # runs on a worker thread and hands the result over to apply_checks
+        try:
+            result = (text, param.verify(text), None)
+        except Exception as e:
+            result = (text, None, str(e))
+        self.check_results.append((entry, generation, result))
+
+    def apply_checks(self):
+        for _ in range(len(self.check_results)):
+            entry, generation, result = self.check_results.popleft()
+            check = self.checks[entry]
+            # drop results of texts that changed while they were validated
+            if generation != check.generation:
+                continue
+            check.result = result
+            self.show_check(entry, result[2])
+        self.root_window.after(self.log_interval, self.apply_checks)
+
+    def show_check(self, entry, error):
+        # nothing to do if the entry shows that result already
+        tooltip = getattr(entry, 'tooltip', None)
+        if tooltip is not None and tooltip.text == (error or False):
+            return
+        if error is None:
+            entry.config(style="TEntry")
+            ToolTip(entry, False)
+        else:
+            entry.config(style="Custom.TEntry")
+            ToolTip(entry, error)
 
     def confirm(self):
+        # rows not scrolled to yet are validated as well
+        self.build_rows(self.mode.get())
         completed = True
         for i, param in enumerate(self.parameters[self.mode.get()]):
             entry = self.entries[self.mode.get()][i]
@@ -224,34 +409,38 @@ class GenericGUI(threading.Thread):
                 param.value = entry.var.get()
                 continue
 
-            try:
-                value = param.verify(entry.get())
-                if value != self.help_text[param.widget]:
-                    entry.config(style="TEntry")
-                    ToolTip(entry, False)
-                    param.value = value
-            except Exception as e:
-                entry.config(style="Custom.TEntry")
-                ToolTip(entry, str(e))
+            # reuse the result of the background validation if the text is still the same
+            text = entry.get()
+            result = self.checks[entry].result
+            if result is None or result[0] != text:
+                try:
+                    result = (text, param.verify(text), None)
+                except Exception as e:
+                    result = (text, None, str(e))
+
+            if result[2] is None:
+                if result[1] != self.help_text[param.widget]:
+                    self.show_check(entry, None)
+                    param.value = result[1]
+            else:
+                self.show_check(entry, result[2])
                 completed = False
 
-        print('completed', completed)
         if completed:
-            self.set_disabled(self.root_window, True)
+            mode = self.mode.get()
+            self.job_count += 1
+            profile = self.profile is not None and self.profile.get()
+            job = Job(self.job_count, mode, {param.name: param.value for param in self.parameters[mode]}, profile)
+            self.show_log_window()
+            self.tabs.append(JobTab(self.notebook, job, self.log_ring_size, self.tabs.remove))
+            self.submissions.put(job)
+
+    def show_log_window(self):
+        if self.log_window is None:
             self.create_log_window()
-            self.event.set()
-
-    def set_disabled(self, widget, bool):
-        state = 'disable' if bool else 'normal'
-        self.set_states(widget, state)
-
-    def set_states(self, widget, mode):
-        try:
-            widget.configure(state=mode)
-        except (AttributeError, tk.TclError):
-            pass
-        for child in widget.winfo_children():
-            self.set_states(child, mode)
+        else:
+            self.log_window.deiconify()
+            self.log_window.lift()
 
     def create_log_window(self):
         self.log_window = tk.Toplevel(self.root_window)
@@ -261,57 +450,182 @@ class GenericGUI(threading.Thread):
         self.log_window.configure(background='white')
         self.log_window.protocol('WM_DELETE_WINDOW', self.on_log_quit)
 
-        self.log_list = tk.Listbox(self.log_window, relief=tk.FLAT, font=('Consolas', '9'), borderwidth=0, highlightthickness=0)
-        self.log_list.pack(side=tk.LEFT, fill=tk.BOTH, padx=(5, 0), expand=True)
-        self.log_scrollbar = ttk.Scrollbar(self.log_window, orient=tk.VERTICAL)
-        self.log_scrollbar.config(command=self.log_list.yview)
-        self.log_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.log_list.config(yscrollcommand=self.log_scrollbar.set)
+        if self.monitor is not None and self.monitor.available:
+            panel = ttk.Frame(self.log_window)
+            panel.pack(side=tk.TOP, fill=tk.X)
+            self.monitor_label = ttk.Label(panel)
+            self.monitor_label.pack(side=tk.LEFT, padx=5, pady=2)
+            ttk.Button(panel, text="Export CSV", command=self.export_resources).pack(side=tk.RIGHT, padx=5, pady=2)
 
-        self.progress = tk.IntVar()
-        self.progress_bar = ttk.Progressbar(self.log_list, orient=tk.HORIZONTAL, length=100, mode='determinate', variable=self.progress)
-        self.progress_bar.place(relx=1.0, rely=1.0, x=-self.progress_bar.winfo_width(), y=-self.progress_bar.winfo_height(), anchor='se')
-        self.progress_bar.place_forget()
+        self.notebook = ttk.Notebook(self.log_window)
+        self.notebook.pack(fill=tk.BOTH, expand=True)
+
+    def show_resources(self):
+        sample = self.monitor.latest
+        if sample is not None and sample is not self.monitor_sample:
+            self.monitor_sample = sample
+            self.monitor_label.config(text=describe_resources(sample))
 
-    processing = False
+    def export_resources(self):
+        path = filedialog.asksaveasfilename(defaultextension='.csv', filetypes=[('CSV', '*.csv')])
+        if path:
+            self.monitor.write_csv(path)
 
     def set_progress(self, percentage):
-        clamped_percentage = max(0, min(percentage, 100))
-        if not self.processing and clamped_percentage > 0:
-            self.progress_bar.place(relx=1.0, rely=1.0, x=-self.progress_bar.winfo_width(), y=-self.progress_bar.winfo_height(), anchor='se')
-            self.processing = True
-        elif self.processing and clamped_percentage == 100:
-            self.progress_bar.place_forget()
-            self.processing = False
-        self.progress.set(clamped_percentage)
-
-    msg_buffer = ""
-    carriage_return = False
+        # only store the progress of the calling job, the tkinter thread samples and shows it
+        job = current_job()
+        if job is None and self.tabs:
+            job = self.tabs[-1].job
+        if job is not None:
+            job.progress.set(max(0, min(percentage, 100)), 100)
+
+    def get_pipe(self):
+        job = current_job()
+        return job.pipe if job is not None else self.log_pipe
 
     def log(self, msg):
-        if msg not in ['\n', '\r']:
-            self.msg_buffer += msg
+        # called from any thread, so only queue the message for the next flush_log
+        return self.get_pipe().write(msg)
+
+    def flush_log(self):
+        # runs on the tkinter thread and moves all queued lines of a job into its tab with one insert
+        try:
+            for tab in list(self.tabs):
+                tab.update()
+            # output written outside of any job goes to the newest tab
+            replace_last, lines = self.log_pipe.drain()
+            if lines and self.tabs:
+                self.tabs[-1].log_view.append(lines, replace_last)
+            if self.monitor_label is not None:
+                self.show_resources()
+        except tk.TclError:
+            pass
+        self.root_window.after(self.log_interval, self.flush_log)
+
+    def catch_subprocess_output(self, process_handle, timeout=None):
+        # stream stdout and stderr of the subprocess to the log in batches of whole lines
+        pipe = self.get_pipe()
+        capture = OutputCapture(pipe.write_lines, pipe.write_error_lines)
+        capture.attach(process_handle)
+        return capture.wait(timeout)[0]
+
+    async def run_subprocess(self, args, timeout=None, **kwargs):
+        # start a subprocess from a coroutine main and stream its output to the log without blocking
+        pipe = self.get_pipe()
+        return await run_async(args, pipe.write_lines, pipe.write_error_lines, timeout=timeout, **kwargs)
+
+
+class JobTab:
+
+    # seconds between two samples of the progress, independent of how often the job reports it
+    sample_interval = 0.25
+
+    def __init__(self, notebook, job, ring_size, on_close):
+        self.notebook = notebook
+        self.job = job
+        self.on_close = on_close
+        self.state = None
+        self.processing = False
+        self.sampled = 0
+
+        self.frame = ttk.Frame(notebook)
+        bar = ttk.Frame(self.frame)
+        bar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.status = ttk.Label(bar)
+        self.status.pack(side=tk.LEFT, padx=5, pady=2)
+        self.button = ttk.Button(bar, text="Cancel", command=self.on_button)
+        self.button.pack(side=tk.RIGHT, padx=5, pady=2)
+        self.progress = tk.IntVar()
+        self.progress_bar = ttk.Progressbar(bar, orient=tk.HORIZONTAL, length=100, mode='determinate', variable=self.progress)
+
+        # search and filter bar above the log
+        search = ttk.Frame(self.frame)
+        search.pack(side=tk.TOP, fill=tk.X)
+        self.level = tk.StringVar()
+        ttk.OptionMenu(search, self.level, 'all', *FILTERS.keys(), command=self.on_filter).pack(side=tk.RIGHT, padx=5, pady=2)
+        ttk.Button(search, text="Next", width=8, command=self.find).pack(side=tk.RIGHT, pady=2)
+        ttk.Button(search, text="Previous", width=8, command=lambda: self.find(True)).pack(side=tk.RIGHT, pady=2)
+        self.matches = ttk.Label(search)
+        self.matches.pack(side=tk.RIGHT, padx=5, pady=2)
+        self.query = ttk.Entry(search)
+        self.query.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=2)
+        self.query.bind('<Return>', lambda event: self.find())
+        self.query.bind('<Shift-Return>', lambda event: self.find(True))
+
+        self.log_view = LogView(self.frame, ring_size)
+
+        notebook.add(self.frame, text="#%d %s" % (job.number, job.mode))
+        notebook.select(self.frame)
+
+    def update(self):
+        # all output of a finished job is queued already
+        replace_last, lines = self.job.pipe.drain(self.job.finished)
+        if lines:
+            self.log_view.append(lines, replace_last)
+
+        now = time.monotonic()
+        if self.job.state != self.state or now - self.sampled >= self.sample_interval:
+            self.sampled = now
+            self.state = self.job.state
+            self.show_progress()
+            if self.job.finished:
+                self.button.config(text="Close")
+
+    def show_progress(self):
+        progress = self.job.progress
+        fraction = progress.sample()
+        running = self.state == RUNNING
+
+        visible = running and fraction is not None
+        if visible and not self.processing:
+            self.progress_bar.pack(side=tk.RIGHT, padx=5, pady=2)
+        elif self.processing and not visible:
+            self.progress_bar.pack_forget()
+        self.processing = visible
+        if visible:
+            self.progress.set(int(100 * fraction))
+
+        text = self.state
+        if running and self.job.cancelled:
+            text = "cancelling"
+        elif running and progress.touched:
+            text += ' ' + progress.describe()
+        self.status.config(text=text)
+
+    def find(self, backwards=False):
+        query = self.query.get()
+        if not query.strip():
+            self.matches.config(text='')
+            return
+        found = self.log_view.find(query, backwards)
+        self.matches.config(text="no match" if found is None else "%d of %d" % found)
+
+    def on_filter(self, level):
+        self.log_view.set_filter(FILTERS[level])
+
+    def on_button(self):
+        if self.job.finished:
+            self.close()
         else:
-            try:
-                if self.carriage_return:
-                    self.log_list.delete(self.log_list.size() - 1)
-                if msg == '\r':
-                    self.carriage_return = True
-                else:
-                    self.carriage_return = False
-                self.log_list.insert(tk.END, self.msg_buffer)
-                self.log_list.yview(tk.END)
-            except Exception as e:
-                pass
-            finally:
-                self.msg_buffer = ""
-
-    def catch_subprocess_output(self, process_handle):
-        while True:
-            nextline = process_handle.stdout.read(1).decode(sys.stdout.encoding, errors='replace')
-            if nextline == '' and process_handle.poll() is not None:
-                break
-            print(nextline, end='')
+            self.job.cancel()
+            self.status.config(text="cancelling")
+
+    def close(self):
+        self.on_close(self)
+        self.log_view.close()
+        self.notebook.forget(self.frame)
+        self.frame.destroy()
+
+
+class EntryCheck:
+
+    def __init__(self, param):
+        self.param = param
+        self.timer = None
+        self.future = None
+        self.generation = 0
+        # tuple (text, value, error) of the last finished validation
+        self.result = None
 
 
 # implementation example ######################################################
@@ -335,16 +649,15 @@ if __name__ == '__main__':
     ui = GenericGUI("Test App", parameters)
 
     while True:
-        ui.get_input()
-        if ui.should_quit:
+        job = ui.get_input()
+        if job is None:
             break
 
-        mode = ui.mode.get()
         del sys.argv[1:]
-        for param in parameters[ui.mode.get()]:
-            print(param.name, param.value.get())
-            sys.argv.append(param.value.get())
+        for name, value in job.args.items():
+            print(name, value)
+            sys.argv.append(value)
 
-        example_main()
+        job.run(lambda **args: example_main())
 
     ui.join()
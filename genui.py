@@ -8,99 +8,219 @@ The CLI complies to the Unix standard and the GUI provides the basic elements fo
 argument validation and output to a separate window.
 
 The decision whether to load the CLI or GUI is based on invocation through a terminal or the Explorer,
-but can be overridden with a "--gui" parameter to load the GUI also from a terminal.
+but can be overridden with a "--gui" or "--cli" parameter or the environment variable GENUI_MODE.
+The detection is done by the functions in launch_detectors, see the launch module.
+
+main can also be a coroutine function, which then runs on an event loop of its own, see the asyncmain module.
+
+While main runs, progress.current() returns the Progress that is shown in the log window
+of the GUI or on the console.
+
+With monitor=True the CPU, memory, threads and I/O of the process and its children are sampled while main
+runs and shown in the log window, or summarized after the run with "--monitor" or "--monitor-csv" in the CLI,
+see the resources module.
+
+The reserved flags "--profile[=path]" and "--trace-alloc[=path]" run main under cProfile and tracemalloc,
+write the statistics to files and print the hotspots and the time of each phase, see the profiling module.
+In the GUI a checkbox next to Run does the same for a job. Set profile_flags to False to turn both off.
+
+With resident=True, or the path of a socket in a directory only the user has access to, a call from
+the command line forks a daemon that keeps the script warm and serves the later calls, see the resident module.
+Not available on Windows.
+
+With batch=True the main function can also be run for every row of a manifest, given by "--batch" in the CLI
+or in the additional "batch" mode of the GUI, see the batch module.
 '''
 
 import sys, os
-import argparse
-import psutil
+import functools
+from collections import OrderedDict
+from contextlib import contextmanager
 
-from .gengui import GenericGUI, OrderedDict
 from .parameter import Parameter
+from .cliparser import compile_parser
+from .progress import Progress, TextReporter, activate, current
+from .asyncmain import call
+from . import launch
+
+# argparse, psutil and the tkinter based GenericGUI are imported on demand,
+# so a run from the command line doesn't pay for the import of the GUI stack
 
 ###############################################################################
 
 
 class GenericUI:
 
-    def __init__(self, parameters, main_function, title=None, version="1.0"):
+    launch_detectors = launch.DETECTORS
+    # number of jobs started from the GUI that run at the same time
+    job_workers = 4
+    # seconds between two samples of the resource monitor in the GUI
+    monitor_interval = 1.0
+    # whether "--profile" and "--trace-alloc" and the checkbox in the GUI are offered
+    profile_flags = True
+    # seconds a resident daemon waits for the next call and number of calls it runs at the same time
+    resident_idle_timeout = 600
+    resident_workers = 8
+
+    def __init__(self, parameters, main_function, title=None, version="1.0", batch=False, monitor=False,
+                 resident=False):
         self.parameters = parameters
         self.main = main_function
         self.title = title
         self.version = version
+        self.batch = batch
+        self.monitor = monitor
+        self.resident = resident
         self.gui = None
 
+        # the verify functions as given, before load_gui adapts them to the text of the entries
+        self.verifiers = {parameter.name: parameter.cached(parameter.verify) for parameter in parameters}
+
     def run(self):
         # determine whether program was launched from explorer
         script = os.path.basename(sys.argv[0])
         if self.title is None:
             self.title = script
 
-        exe = psutil.Process(os.getpid()).parent().name()
-        parent_exe = psutil.Process(os.getpid()).parent().parent().name()
-
-        load_ui = False
-        if script == exe and parent_exe == 'explorer.exe':
-            load_ui = True
-        if '--gui' in sys.argv:
-            sys.argv.remove('--gui')
-            load_ui = True
-
-        if load_ui:
+        if launch.detect(script, self.launch_detectors) == launch.GUI:
             self.load_gui()
+        elif self.resident:
+            self.run_resident()
         else:
             self.load_cli()
 
-    def load_cli(self):
-        # prepare parameters for argparse
-        parser = argparse.ArgumentParser()
-        for parameter in self.parameters:
-            identifiers = []
-            specifiers = {}
+    def run_resident(self):
+        from . import resident
+        # other platforms just run the call here
+        if not resident.available():
+            self.load_cli()
+            return
+        path = self.resident if isinstance(self.resident, str) else resident.default_path(sys.argv[0])
+        code = resident.forward(path)
+        if code is not None:
+            sys.exit(code)
+
+        # no daemon yet, start one for the next calls and run this one here
+        resident.start_daemon(self.serve_request, path, self.resident_idle_timeout, self.resident_workers,
+                              prepare=lambda: compile_parser(self.parameters).parser)
+        self.load_cli()
+
+    def serve_request(self):
+        # runs in a child of the daemon with the arguments, streams and environment of the call
+        launch.from_arguments(os.path.basename(sys.argv[0]))
+        self.load_cli()
 
-            if not parameter.short and not parameter.long:
-                identifiers.append(parameter.name)
-            else:
-                if parameter.short is not None:
-                    identifiers.append(parameter.short)
-                if parameter.long is not None:
-                    identifiers.append(parameter.long)
-                specifiers['dest'] = parameter.name
-
-            if parameter.nargs != 1:
-                if parameter.nargs == 0:
-                    specifiers['action'] = 'store_true' if not parameter.default else 'store_false'
-                else:
-                    specifiers['nargs'] = parameter.nargs
-
-            if parameter.default is not None:
-                specifiers['default'] = parameter.default
-            if parameter.meta is not None:
-                specifiers['metavar'] = parameter.meta
-            if parameter.help is not None:
-                specifiers['help'] = parameter.help
-
-            if 'action' not in specifiers:
-                # convert any exception of parameter.verify to the argparse exception
-                verify_func = parameter.verify
-                if type(verify_func).__name__ != 'type':
-                    def error_wrap(func):
-                        def wrapped(value):
-                            try:
-                                return func(value)
-                            except Exception as e:
-                                raise argparse.ArgumentTypeError(str(e))
-                        return wrapped
-                    verify_func = error_wrap(verify_func)
-                specifiers['type'] = verify_func
-
-            parser.add_argument(*identifiers, **specifiers)
-        args = parser.parse_args()
+    def load_cli(self):
+        profiler = None
+        # a parameter of the script may use the same flag as a wrapper around main
+        reserved = [parameter.long for parameter in self.parameters if parameter.long]
+        if self.profile_flags:
+            from . import profiling
+            try:
+                profile_path, trace_path = profiling.pop_arguments(sys.argv, reserved)
+            except ValueError as e:
+                self.exit_with_error(e)
+            if profile_path is not None or trace_path is not None:
+                profiler = profiling.Profiler(profile_path, trace_path)
+
+        interval = csv_path = None
+        if self.monitor:
+            from . import resources
+            try:
+                interval, csv_path = resources.pop_arguments(sys.argv, reserved)
+            except ValueError as e:
+                self.exit_with_error(e)
+
+        if self.batch:
+            from . import batch
+            try:
+                manifest, workers, processes = batch.pop_arguments(sys.argv, reserved)
+            except ValueError as e:
+                self.exit_with_error(e)
+            if manifest is not None:
+                with self.report_progress(), self.monitor_resources(interval, csv_path):
+                    results = self.call_main(profiler, self.run_batch, manifest, workers, processes,
+                                             self.set_batch_progress)
+                sys.exit(1 if any([result.failed for result in results]) else 0)
+
+        args = self.parse_arguments(profiler)
 
         # pass the arguments in a dictionary
-        self.main(**vars(args))
+        with self.report_progress(), self.monitor_resources(interval, csv_path):
+            self.call_main(profiler, self.main, **args)
+
+    def parse_arguments(self, profiler=None):
+        # the parser is compiled once per set of parameters and argparse only imported if needed
+        parser = compile_parser(self.parameters)
+        if profiler is None:
+            return parser.parse()
+
+        # time the verify function of each parameter, the parser is cached so they are put back afterwards
+        verifiers = [(argument, argument.verify) for argument in parser.arguments]
+        built = parser.argparse_parser is not None
+        try:
+            for argument, verify in verifiers:
+                argument.verify = profiler.timed('verify %s' % argument.dest, verify)
+            with profiler.phase('parse arguments'):
+                return parser.parse()
+        finally:
+            for argument, verify in verifiers:
+                argument.verify = verify
+            if not built:
+                parser.argparse_parser = None
+
+    def call_main(self, profiler, func, *args, **kwargs):
+        # a main defined with async def runs on an event loop until it is done
+        if profiler is None:
+            return call(func, *args, **kwargs)
+        try:
+            return profiler.run(call, func, *args, **kwargs)
+        finally:
+            profiler.report()
+
+    def run_profiled(self, func, number, **args):
+        # the files of a job from the GUI are numbered like its tab
+        from .profiling import Profiler, default_paths
+        profiler = Profiler(*default_paths(sys.argv[0], '-job%d' % number))
+        return self.call_main(profiler, func, **args)
+
+    def exit_with_error(self, error):
+        # exit like argparse does on invalid arguments
+        sys.stderr.write("%s: error: %s\n" % (os.path.basename(sys.argv[0]), error))
+        sys.exit(2)
+
+    @contextmanager
+    def report_progress(self):
+        # show the progress main reports through progress.current() on the console
+        progress = Progress()
+        with activate(progress), TextReporter(progress):
+            yield
+
+    @contextmanager
+    def monitor_resources(self, interval, csv_path):
+        # print a summary of the resources used by main to stderr once it returns
+        if interval is None:
+            yield
+            return
+        from .resources import ResourceMonitor
+        monitor = ResourceMonitor(interval)
+        if not monitor.available:
+            sys.stderr.write("the resource monitor needs psutil\n")
+            yield
+            return
+        try:
+            with monitor:
+                yield
+        finally:
+            sys.stderr.write(monitor.format_summary() + '\n')
+            if csv_path is not None:
+                monitor.write_csv(csv_path)
 
     def load_gui(self):
+        from .gengui import GenericGUI
+        from .jobs import JobScheduler
+        from .resources import ResourceMonitor
+
         # prepare parameters for BasicGUI
         for parameter in self.parameters:
             verify_func = parameter.verify
@@ -115,38 +235,61 @@ class GenericUI:
                     return wrapped
                 verify_func = type_check(verify_func.__name__)
 
+            # remember the results for values that are checked again on a re-run
+            verify_func = parameter.cached(verify_func)
+
             if parameter.nargs not in [0, 1, '?']:
-                # with a list of arguments for a parameter convert verify_func
-                # to do the validation for every list item
-                def list_wrap(func):
-                    def wrapped(values):
-                        checked_list = []
-                        for value in [value.strip() for value in values.split(',')]:
-                            checked_list.append(func(value))
-                        return checked_list
-                    return wrapped
-                verify_func = list_wrap(verify_func)
+                verify_func = list_wrap(verify_func, parameter)
 
             parameter.verify = verify_func
 
+        # the modes are read back from a tkinter variable, which always holds a string
         parameters = OrderedDict()
-        parameters[self.version] = self.parameters
-        self.gui = GenericGUI(self.title, parameters)
-
-        # loop to allow re-run of the process with altered arguments
+        parameters[str(self.version)] = self.parameters
+        if self.batch:
+            from . import batch
+            parameters[batch.MODE] = batch.gui_parameters()
+        # the monitor samples the whole process, which runs all jobs
+        monitor = ResourceMonitor(self.monitor_interval).start() if self.monitor else None
+        self.gui = GenericGUI(self.title, parameters, monitor, self.profile_flags)
+
+        # every click on Run is a job with its own arguments, which runs next to the jobs already started
+        scheduler = JobScheduler(self.job_workers)
         while True:
-            self.gui.get_input()
-            if self.gui.should_quit:
+            job = self.gui.get_input()
+            if job is None:
                 break
 
-            # pass the arguments in a dictionary
-            args = {}
-            for parameter in parameters[self.gui.mode.get()]:
-                args[parameter.name] = parameter.value
-
-            self.main(**args)
+            if self.batch and job.mode == batch.MODE:
+                func = functools.partial(self.run_batch, progress=self.set_batch_progress)
+            else:
+                func = self.main
+            if job.profile:
+                func = functools.partial(self.run_profiled, func, job.number)
+            scheduler.submit(job, func)
 
+        # ask the running jobs to stop and wait for them
+        scheduler.shutdown()
         self.gui.join()
+        if monitor is not None:
+            monitor.stop()
+
+    def run_batch(self, manifest, workers, processes, progress=None):
+        from . import batch
+        results = batch.run_batch(self.main, self.parameters, self.verifiers, manifest, workers, processes, progress)
+        batch.print_summary(results)
+        return results
+
+    def set_batch_progress(self, done, total):
+        current().set(done, total)
+
+
+def list_wrap(func, parameter):
+    # with a list of arguments for a parameter the GUI takes them comma separated in one entry
+    # and verifies every list item in parallel
+    def wrapped(values):
+        return parameter.verify_list(func, [value.strip() for value in values.split(',')])
+    return wrapped
 
 
 # implementation example ######################################################
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Jobs to run the main function in the background of the GUI.
+
+Every click on Run creates a Job with a snapshot of the arguments, a LogPipe for its output
+and its own Progress, which progress.current() returns while the job runs. The JobScheduler
+runs the jobs on a pool of worker threads, so several sets of parameters can be processed
+at the same time while the form stays usable.
+
+While a job runs, everything its thread writes to sys.stdout and sys.stderr goes to its pipe,
+as long as the streams are routed with capture.install(). The job is kept in a context variable,
+so threads started with capture.bind() in the job belong to it as well.
+
+Jobs are cancelled cooperatively: a long running main function should check cancelled() now and then
+and return early once it is True. A job that didn't start yet is simply dropped.
+'''
+
+import threading
+import traceback
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from .logpipe import LogPipe
+from .capture import redirect
+from .asyncmain import call
+from .progress import Progress, activate
+
+###############################################################################
+
+PENDING = 'waiting'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+current = contextvars.ContextVar('job', default=None)
+
+
+class Job:
+
+    def __init__(self, number, mode, args, profile=False):
+        self.number = number
+        self.mode = mode
+        self.args = args
+        self.profile = profile
+        self.pipe = LogPipe()
+        self.state = PENDING
+        self.progress = Progress()
+        self.result = None
+        self.future = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.state in [DONE, FAILED, CANCELLED]
+
+    def cancel(self):
+        self.cancel_event.set()
+        if self.future is not None and self.future.cancel():
+            self.state = CANCELLED
+
+    def run(self, func):
+        # runs on a worker thread of the scheduler
+        if self.cancelled:
+            self.state = CANCELLED
+            return
+        self.state = RUNNING
+        token = current.set(self)
+        try:
+            with redirect(self.pipe.write, self.pipe.write_error), activate(self.progress):
+                self.result = call(func, **self.args)
+            self.state = CANCELLED if self.cancelled else DONE
+        except Exception:
+            self.pipe.write_error(traceback.format_exc())
+            self.state = FAILED
+        finally:
+            current.reset(token)
+
+
+def current_job():
+    return current.get()
+
+
+def cancelled():
+    # whether the job of the calling thread was asked to stop
+    job = current_job()
+    return job is not None and job.cancelled
+
+
+class JobScheduler:
+
+    def __init__(self, workers=4):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.jobs = []
+
+    def submit(self, job, func):
+        self.jobs.append(job)
+        job.future = self.executor.submit(job.run, func)
+        return job
+
+    def shutdown(self, cancel=True):
+        if cancel:
+            for job in self.jobs:
+                job.cancel()
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Detection whether a script was launched from a terminal or from the Explorer.
+
+The explicit arguments "--gui" and "--cli" are always checked first and removed from sys.argv.
+Otherwise the detectors are asked in order until one decides, so the cheap signals come first:
+    - the environment variable GENUI_MODE set to 'gui' or 'cli'
+    - a standard input that is redirected means the script is run by another program
+    - a standard input that is a terminal outside of Windows means the script runs in a terminal
+    - a Windows console that has no other process attached was created for a launch from the Explorer
+    - the process tree is walked with psutil, if it is installed
+If no detector decides, the CLI is loaded. The decision of the detectors is cached per process.
+
+usage:
+    - load_ui = detect(script) == GUI
+    - a detector is any function taking the script name and returning GUI, CLI or None
+'''
+
+import os
+import sys
+
+###############################################################################
+
+GUI = 'gui'
+CLI = 'cli'
+
+ENVIRONMENT_VARIABLE = 'GENUI_MODE'
+
+
+def from_arguments(script):
+    mode = None
+    for argument, argument_mode in [('--gui', GUI), ('--cli', CLI)]:
+        if argument in sys.argv:
+            sys.argv.remove(argument)
+            mode = mode or argument_mode
+    return mode
+
+
+def from_environment(script):
+    mode = os.environ.get(ENVIRONMENT_VARIABLE, '').lower()
+    return mode if mode in [GUI, CLI] else None
+
+
+def from_stdin(script):
+    # pythonw has no stdin at all and the Explorer gives python a console of its own
+    if sys.stdin is None:
+        return None
+    try:
+        if not sys.stdin.isatty():
+            return CLI
+    except (AttributeError, ValueError):
+        return None
+    return CLI if os.name != 'nt' else None
+
+
+def from_console(script):
+    if os.name != 'nt':
+        return None
+    import ctypes
+    process_list = (ctypes.c_uint * 2)()
+    if ctypes.windll.kernel32.GetConsoleProcessList(process_list, 2) == 1:
+        return GUI
+    return None
+
+
+def from_process_tree(script):
+    try:
+        import psutil
+    except ImportError:
+        return None
+    parent = psutil.Process(os.getpid()).parent()
+    if parent is None or parent.name() != script:
+        return None
+    grandparent = parent.parent()
+    if grandparent is not None and grandparent.name() == 'explorer.exe':
+        return GUI
+    return None
+
+
+DETECTORS = [from_environment, from_stdin, from_console, from_process_tree]
+
+detected = {}
+
+
+def detect(script, detectors=None):
+    mode = from_arguments(script)
+    if mode is not None:
+        return mode
+
+    # cache by process id, so a forked child detects again
+    key = os.getpid()
+    if key not in detected:
+        detected[key] = CLI
+        for detector in detectors or DETECTORS:
+            mode = detector(script)
+            if mode is not None:
+                detected[key] = mode
+                break
+    return detected[key]
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Incremental index of the lines of a log, to filter them by severity and to search them for words.
+
+Every line gets its flags when it is appended: STDERR for a line written to stderr (see logpipe.ErrorLine),
+ERROR or WARNING for a line that looks like an error or warning message, whichever stream it came from.
+For every flag the numbers of its lines are kept in an array, so a filter only touches the lines it shows.
+
+For every word the index keeps the blocks of BLOCK_SIZE lines containing it. A search finds the indexed
+words starting with each word of the query by bisecting them in order, only reads the lines of the blocks
+that contain all of them and remembers how far it got, so searching again after more lines arrived
+only reads the new ones.
+
+usage:
+    - index = LogIndex(history) next to the LogHistory the lines are appended to
+    - index.append(lines, replace_last) after every LogHistory.append
+    - index.matching(flags) returns the numbers of the lines with any of flags, see FILTERS
+    - index.search(query) returns the numbers of the lines with a word starting with every word of query,
+      ignoring case, so "err" finds "Error:" but not "stderr"
+    - words are split at whitespace and ASCII punctuation and numbers alone are not indexed,
+      so a query made only of numbers reads every line once
+'''
+
+import re
+import string
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, islice
+from collections import OrderedDict
+
+from .logpipe import ErrorLine
+
+###############################################################################
+
+ERROR = 1
+WARNING = 2
+STDERR = 4
+
+# filters offered by the log window and the flags of the lines they show
+FILTERS = OrderedDict([('all', 0), ('errors', ERROR), ('warnings', ERROR | WARNING), ('stderr', STDERR)])
+
+PATTERNS = {ERROR: re.compile(r'\b(?:ERROR|CRITICAL|FATAL)\b|^Traceback \(most recent call last\)|(?:Error|Exception):'),
+            WARNING: re.compile(r'\bWARN(?:ING)?\b|Warning:')}
+# only the lines containing one of these are matched against the patterns of their flag
+KEYWORDS = [('ERROR', ERROR), ('CRITICAL', ERROR), ('FATAL', ERROR), ('Traceback', ERROR), ('Error:', ERROR),
+            ('Exception:', ERROR), ('WARN', WARNING), ('Warning:', WARNING)]
+SEPARATORS = str.maketrans({character: ' ' for character in string.punctuation + string.whitespace
+                            if character != '_'})
+
+BLOCK_SIZE = 32
+
+
+class LogIndex:
+
+    def __init__(self, history):
+        self.history = history
+        self.count = 0
+        self.flags = array('B')
+        self.flagged = OrderedDict((flag, array('I')) for flag in [ERROR, WARNING, STDERR])
+        # numbers of the blocks containing each word, in ascending order
+        self.postings = {}
+        # the indexed words in order, and those added since the last search
+        self.words = []
+        self.new_words = []
+        self.block = -1
+        self.block_words = set()
+        # query, its matches and the number of lines searched for it
+        self.searched = None
+
+    def append(self, lines, replace_last=False):
+        if replace_last and self.count:
+            self.remove_last()
+        start = self.count
+        self.classify(lines, start)
+
+        postings = self.postings
+        position = 0
+        while position < len(lines):
+            block, offset = divmod(start + position, BLOCK_SIZE)
+            end = position + BLOCK_SIZE - offset
+            if block != self.block:
+                self.block = block
+                self.block_words = set()
+            words = set(split_words('\n'.join(lines[position:end])))
+            words.difference_update(self.block_words)
+            for word in words:
+                blocks = postings.get(word)
+                if blocks is None:
+                    postings[word] = array('I', [block])
+                    self.new_words.append(word)
+                else:
+                    blocks.append(block)
+            self.block_words.update(words)
+            position = end
+        self.count = start + len(lines)
+
+    def classify(self, lines, start):
+        # look for the keywords in the whole batch at once, only the lines containing one cost extra
+        flags = {index: STDERR for index, line in enumerate(lines) if type(line) is ErrorLine}
+        text = '\n'.join(lines)
+        ends = None
+        for keyword, flag in KEYWORDS:
+            position = text.find(keyword)
+            while position != -1:
+                if ends is None:
+                    ends = list(accumulate([len(line) + 1 for line in lines]))
+                index = bisect_right(ends, position)
+                if PATTERNS[flag].search(lines[index]) is not None:
+                    flags[index] = flags.get(index, 0) | flag
+                position = text.find(keyword, ends[index])
+
+        new = bytearray(len(lines))
+        for index in sorted(flags):
+            new[index] = flags[index]
+            for flag, numbers in self.flagged.items():
+                if flags[index] & flag:
+                    numbers.append(start + index)
+        self.flags.frombytes(bytes(new))
+
+    def remove_last(self):
+        # the words of the line stay in the postings of its block, a search reads the block anyway
+        self.count -= 1
+        self.flags.pop()
+        for numbers in self.flagged.values():
+            if numbers and numbers[-1] == self.count:
+                numbers.pop()
+        if self.searched is not None and self.searched[2] > self.count:
+            parts, found, searched = self.searched
+            while found and found[-1] >= self.count:
+                found.pop()
+            self.searched = (parts, found, self.count)
+
+    def matching(self, flags, start=0):
+        # numbers from start on of the lines with any of flags, in ascending order
+        found = [numbers[bisect_left(numbers, start):] for flag, numbers in self.flagged.items() if flags & flag]
+        if len(found) == 1:
+            return found[0]
+        return array('I', sorted(set().union(*found)))
+
+    def search(self, query):
+        '''Numbers of the lines with a word starting with every word of query, ignoring case, in ascending order.'''
+        parts = tuple(query.lower().translate(SEPARATORS).split())
+        if not parts:
+            return array('I')
+        if self.searched is not None and self.searched[0] == parts:
+            parts, found, start = self.searched
+        else:
+            found, start = array('I'), 0
+        if start == self.count:
+            return found
+
+        for first, last in self.candidates(parts, start):
+            for number, line in enumerate(self.history.get(first, last), first):
+                line = ' ' + line.lower().translate(SEPARATORS)
+                if all([' ' + part in line for part in parts]):
+                    found.append(number)
+        self.searched = (parts, found, self.count)
+        return found
+
+    def candidates(self, parts, start):
+        # ranges of lines from start on in the blocks that contain all words of the parts
+        blocks = None
+        for word in parts:
+            if word.isdigit():
+                continue
+            found = self.lookup(word, start // BLOCK_SIZE)
+            blocks = found if blocks is None else intersect(blocks, found)
+        if blocks is None:
+            # nothing but numbers in the query
+            return [(start, self.count)]
+
+        ranges = []
+        for block in blocks:
+            first = max(start, block * BLOCK_SIZE)
+            last = min(self.count, (block + 1) * BLOCK_SIZE)
+            if ranges and ranges[-1][1] == first:
+                ranges[-1] = (ranges[-1][0], last)
+            else:
+                ranges.append((first, last))
+        return ranges
+
+    def lookup(self, word, first_block):
+        # the blocks of word itself and of the indexed words starting with it, which follow it in order
+        if self.new_words:
+            # the sorted words followed by a sorted run of the new ones, merged by a single pass of sort
+            self.new_words.sort()
+            self.words.extend(self.new_words)
+            self.words.sort()
+            self.new_words = []
+
+        postings = self.postings
+        found = []
+        blocks = postings.get(word)
+        if blocks is not None:
+            found.append(blocks[bisect_left(blocks, first_block):])
+        for indexed in islice(self.words, bisect_right(self.words, word), None):
+            if not indexed.startswith(word):
+                break
+            blocks = postings[indexed]
+            found.append(blocks[bisect_left(blocks, first_block):])
+        if len(found) == 1:
+            return found[0]
+        return array('I', sorted(set().union(*found)))
+
+
+def split_words(text):
+    return [word for word in text.lower().translate(SEPARATORS).split() if not word.isdigit()]
+
+
+def intersect(numbers, others):
+    # look up the numbers of the shorter array in the longer one
+    if len(numbers) > len(others):
+        numbers, others = others, numbers
+    found = array('I')
+    length = len(others)
+    for number in numbers:
+        position = bisect_left(others, number)
+        if position < length and others[position] == number:
+            found.append(number)
+    return found
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Thread-safe pipeline to carry log output from any thread to the tkinter log window.
+
+Writers only append to a deque, which is atomic in CPython and never touches tkinter.
+The tkinter thread drains the queue on a timer and receives the assembled lines as one batch,
+so a burst of thousands of print calls costs a single widget update per frame.
+
+usage:
+    - install write() as the output function of the worker, e.g. sys.stdout.write = pipe.write
+    - write_lines() queues a whole batch of lines ending with '\n' or '\r' as a single item
+    - write_error() and write_error_lines() do the same for stderr, the lines assembled from them
+      are returned as ErrorLine, so the log can tell them apart, but are only shown once completed
+    - call drain() periodically on the tkinter thread and apply its result to the log widget,
+      and drain(final=True) once the writer is done
+    - a line ended by '\r' is replaced by the next line, a line ended by '\n' or '\r\n' is kept
+    - a partial line is shown on drain() as well and replaced once it is completed, so is a line
+      ended by '\r' as long as the next text, which may start with '\n', hasn't arrived
+'''
+
+import re
+from itertools import repeat
+from collections import deque
+
+###############################################################################
+
+LINE_END = re.compile(r'\r\n|\r|\n')
+
+
+class LineAssembler:
+
+    def __init__(self, max_partial=65536):
+        self.max_partial = max_partial
+        self.pieces = []
+        self.length = 0
+        # the pieces form a line ended by '\r', that becomes '\r\n' if the next text starts with '\n'
+        self.carriage_return = False
+
+    def feed(self, text):
+        '''Split text into complete lines, joining it with what is left of the previous texts.
+
+        Returns a list of tuples (line, terminator) with terminator being '\n' or '\r'.
+        Every character is looked at once and the pieces of a line are joined once.
+        '''
+        # the two writes of a print call, first the text and then the line break
+        if not self.carriage_return:
+            if text == '\n':
+                return [(self.take(), '\n')]
+            if '\n' not in text and '\r' not in text and self.length + len(text) <= self.max_partial:
+                self.pieces.append(text)
+                self.length += len(text)
+                return ()
+
+        lines = []
+        position = 0
+        if self.carriage_return:
+            self.carriage_return = False
+            lines.append((self.take(), '\n' if text.startswith('\n') else '\r'))
+            position = 1 if text.startswith('\n') else 0
+
+        # without any '\r' the text can be split by the much faster str.split
+        if '\r' not in text:
+            parts = text[position:].split('\n')
+            if len(parts) > 1:
+                self.add(lines, parts[0])
+                lines.append((self.take(), '\n'))
+                lines.extend(zip(parts[1:-1], repeat('\n')))
+            self.add(lines, parts[-1])
+            return lines
+
+        for match in LINE_END.finditer(text, position):
+            self.add(lines, text[position:match.start()])
+            position = match.end()
+            if match.group() == '\r' and position == len(text):
+                self.carriage_return = True
+                return lines
+            lines.append((self.take(), match.group()[-1]))
+        self.add(lines, text[position:])
+        return lines
+
+    def flush(self):
+        # settle a line ended by '\r' without waiting for the next text
+        if not self.carriage_return:
+            return []
+        self.carriage_return = False
+        return [(self.take(), '\r')]
+
+    def add(self, lines, text):
+        if not text:
+            return
+        self.pieces.append(text)
+        self.length += len(text)
+
+        # break a partial line that grew too long instead of buffering it forever
+        if self.length > self.max_partial:
+            partial = self.take()
+            cut = len(partial) - len(partial) % self.max_partial
+            for start in range(0, cut, self.max_partial):
+                lines.append((partial[start:start + self.max_partial], '\n'))
+            self.add(lines, partial[cut:])
+
+    def take(self):
+        line = ''.join(self.pieces)
+        self.pieces = []
+        self.length = 0
+        return line
+
+    def partial(self):
+        line = ''.join(self.pieces)
+        self.pieces = [line] if line else []
+        return line
+
+
+class ErrorLine(str):
+    '''A line written to stderr.'''
+
+    __slots__ = ()
+
+
+class LogPipe:
+
+    def __init__(self, max_partial=65536):
+        self.queue = deque()
+        self.assembler = LineAssembler(max_partial)
+        # stderr gets its own assembler, so a partial line of one stream isn't joined with the other
+        self.error_assembler = LineAssembler(max_partial)
+        self.carriage_return = False
+        self.replace_last = False
+        self.partial_length = 0
+
+    def write(self, msg):
+        self.queue.append(msg)
+        return len(msg)
+
+    def write_lines(self, lines):
+        self.queue.append(''.join(lines))
+
+    def write_error(self, msg):
+        self.queue.append(ErrorLine(msg))
+        return len(msg)
+
+    def write_error_lines(self, lines):
+        self.queue.append(ErrorLine(''.join(lines)))
+
+    def drain(self, final=False):
+        '''Assemble all writes queued so far into lines.
+
+        Returns a tuple (replace_last, lines) with replace_last telling whether the last line
+        already shown has to be removed, because it ended with a carriage return.
+        With final the writes are over, so the lines still waiting for more text are settled.
+        '''
+        self.replace_last = False
+        lines = []
+
+        # only take what is queued right now so a busy writer can't starve the caller
+        feed = self.assembler.feed
+        popleft = self.queue.popleft
+        for _ in range(len(self.queue)):
+            text = popleft()
+            if type(text) is ErrorLine:
+                for line, terminator in self.error_assembler.feed(text):
+                    self.end_line(lines, ErrorLine(line), terminator)
+                continue
+            for line, terminator in feed(text):
+                self.end_line(lines, line, terminator)
+        if final:
+            for assembler, kind in [(self.assembler, str), (self.error_assembler, ErrorLine)]:
+                for line, terminator in assembler.flush():
+                    self.end_line(lines, kind(line), terminator)
+                if assembler.length:
+                    self.end_line(lines, kind(assembler.take()), '\n')
+
+        # show a partial line that grew since the last drain, it is replaced once completed,
+        # and so is a line ended by '\r' until the next text tells whether it is kept
+        if self.assembler.length and self.assembler.length != self.partial_length:
+            self.end_line(lines, self.assembler.partial(), '\r')
+        self.partial_length = self.assembler.length
+
+        return self.replace_last, lines
+
+    def end_line(self, lines, line, terminator):
+        if self.carriage_return:
+            if lines:
+                lines.pop()
+            else:
+                self.replace_last = True
+        self.carriage_return = terminator == '\r'
+        self.partial_length = 0
+        lines.append(line)
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Bounded log view for tkinter that keeps the full history of a run on disk.
+
+The listbox only ever holds a window of at most ring_size lines. Every line is also appended
+to a temporary file, of which only the offset of every stride-th line is kept in memory.
+Scrolling past the edge of the window pages the neighbouring lines in from the file,
+so memory stays flat no matter how long the run is.
+
+The lines are also added to a LogIndex, which lets the view show only the lines of a severity
+and jump to the lines containing some words without reading the history again.
+
+usage:
+    - view = LogView(master) packs a listbox and a scrollbar into master
+    - view.append(lines, replace_last) adds lines as returned by LogPipe.drain()
+    - view.set_filter(flags) only shows the lines with any of flags, see logindex.FILTERS, 0 shows all
+    - view.find(query) selects the next line with a word starting with every word of query,
+      find(query, True) the previous one
+    - view.close() removes the history file once the view is not needed anymore
+'''
+
+import mmap
+import tempfile
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+import tkinter as tk
+import tkinter.ttk as ttk
+
+from .logindex import LogIndex, intersect, ERROR, WARNING, STDERR
+
+###############################################################################
+
+
+class LogHistory:
+
+    def __init__(self, ring_size=5000, stride=256, use_mmap=False):
+        self.file = tempfile.TemporaryFile()
+        self.stride = stride
+        self.use_mmap = use_mmap
+        self.map = None
+
+        self.count = 0
+        self.end = 0
+        self.last_offset = 0
+        # file offset of every stride-th line
+        self.offsets = array('Q')
+        # the most recent lines are kept in memory for fast access
+        self.recent = deque(maxlen=ring_size)
+
+    def append(self, lines, replace_last=False):
+        if replace_last and self.count:
+            self.remove_last()
+
+        chunks = []
+        offset = self.end
+        for line in lines:
+            if self.count % self.stride == 0:
+                self.offsets.append(offset)
+            data = line.encode('utf-8', errors='replace') + b'\n'
+            chunks.append(data)
+            self.last_offset = offset
+            offset += len(data)
+            self.count += 1
+
+        self.release_map()
+        self.file.seek(self.end)
+        self.file.write(b''.join(chunks))
+        self.end = offset
+        self.recent.extend(lines)
+
+    def remove_last(self):
+        self.release_map()
+        self.file.seek(self.last_offset)
+        self.file.truncate()
+        self.end = self.last_offset
+        self.count -= 1
+        if self.count % self.stride == 0:
+            self.offsets.pop()
+        if self.recent:
+            self.recent.pop()
+
+        # find the start of the new last line, which is at most one stride away
+        if self.count:
+            start = self.offsets[(self.count - 1) // self.stride]
+            skip = (self.count - 1) % self.stride
+            source = self.get_source()
+            source.seek(start)
+            for _ in range(skip):
+                source.readline()
+            self.last_offset = source.tell()
+        else:
+            self.last_offset = 0
+
+    def get(self, first, last):
+        # return the lines with index first up to but excluding last
+        first = max(0, first)
+        last = min(last, self.count)
+        if first >= last:
+            return []
+
+        recent_start = self.count - len(self.recent)
+        lines = []
+        if first < recent_start:
+            source = self.get_source()
+            source.seek(self.offsets[first // self.stride])
+            for _ in range(first % self.stride):
+                source.readline()
+            for _ in range(min(last, recent_start) - first):
+                lines.append(source.readline()[:-1].decode('utf-8', errors='replace'))
+            first = recent_start
+        for index in range(first - recent_start, last - recent_start):
+            lines.append(self.recent[index])
+        return lines
+
+    def get_lines(self, numbers):
+        # return the lines with the given ascending indexes, reading on from one to the next where possible
+        recent_start = self.count - len(self.recent)
+        lines = []
+        source = None
+        position = None
+        for number in numbers:
+            if number >= recent_start:
+                lines.append(self.recent[number - recent_start])
+                continue
+            if source is None:
+                source = self.get_source()
+            if position is None or number < position or number - position > self.stride:
+                position = number - number % self.stride
+                source.seek(self.offsets[number // self.stride])
+            for _ in range(number - position):
+                source.readline()
+            lines.append(source.readline()[:-1].decode('utf-8', errors='replace'))
+            position = number + 1
+        return lines
+
+    def get_source(self):
+        self.file.flush()
+        if not self.use_mmap or not self.end:
+            return self.file
+        if self.map is None:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.map
+
+    def release_map(self):
+        # a mapped file can't be extended or truncated on every platform, so drop the map first
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+    def close(self):
+        self.release_map()
+        self.file.close()
+
+
+class LogView:
+
+    # colors of the lines by their flags, the first flag that is set wins
+    colors = [(ERROR, 'red'), (WARNING, 'dark orange'), (STDERR, 'dark red')]
+
+    def __init__(self, master, ring_size=5000, use_mmap=False):
+        self.history = LogHistory(ring_size, use_mmap=use_mmap)
+        self.index = LogIndex(self.history)
+        self.ring_size = ring_size
+        # first and size are positions in the shown lines, which are the numbers of the lines in the
+        # history passing the filter, or None to show all
+        self.rows = None
+        self.filter = 0
+        self.first = 0
+        self.size = 0
+        self.follow = True
+        self.paging = None
+        # history number of the line found last
+        self.found = None
+
+        self.listbox = tk.Listbox(master, relief=tk.FLAT, font=('Consolas', '9'), borderwidth=0, highlightthickness=0)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, padx=(5, 0), expand=True)
+        self.scrollbar = ttk.Scrollbar(master, orient=tk.VERTICAL)
+        self.scrollbar.config(command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.listbox.config(yscrollcommand=self.on_listbox_scroll)
+
+    def total(self):
+        return self.history.count if self.rows is None else len(self.rows)
+
+    def number(self, position):
+        return position if self.rows is None else self.rows[position]
+
+    def fetch(self, first, last):
+        if self.rows is None:
+            return self.history.get(first, last)
+        return self.history.get_lines(self.rows[max(0, first):last])
+
+    def append(self, lines, replace_last=False):
+        shows_end = self.first + self.size == self.total()
+        start = self.history.count - 1 if replace_last and self.history.count else self.history.count
+        self.history.append(lines, replace_last)
+        self.index.append(lines, replace_last)
+        numbers = range(start, self.history.count)
+        if self.rows is not None:
+            # the replaced line is only removed if it passed the filter, the new lines only added if they do
+            replace_last = bool(self.rows) and self.rows[-1] == start
+            if replace_last:
+                self.rows.pop()
+            numbers = self.index.matching(self.filter, start)
+            lines = [lines[number - start] for number in numbers]
+            self.rows.extend(numbers)
+        if not shows_end:
+            self.update_scrollbar()
+            return
+
+        if replace_last and self.size:
+            self.listbox.delete(tk.END)
+            self.size -= 1
+        if not self.follow:
+            # keep the position of the reader, but fill up the window while it shows the end
+            lines = lines[:self.ring_size - self.size]
+        if lines:
+            self.listbox.insert(tk.END, *lines)
+            self.color(self.size, numbers[:len(lines)])
+            self.size += len(lines)
+
+        excess = self.size - self.ring_size
+        if excess > 0:
+            self.listbox.delete(0, excess - 1)
+            self.first += excess
+            self.size -= excess
+        if self.follow:
+            self.listbox.yview(tk.END)
+        self.update_scrollbar()
+
+    def load(self, first):
+        # replace the listbox content with the window starting at line first
+        first = max(0, min(first, self.total() - self.ring_size))
+        lines = self.fetch(first, first + self.ring_size)
+        self.listbox.delete(0, tk.END)
+        if lines:
+            self.listbox.insert(tk.END, *lines)
+            self.color(0, [self.number(position) for position in range(first, first + len(lines))])
+        self.first = first
+        self.size = len(lines)
+
+    def color(self, row, numbers):
+        # color the listbox rows from row on by the flags of the lines with the given numbers
+        flags = self.index.flags
+        for number in numbers:
+            if flags[number]:
+                for flag, color in self.colors:
+                    if flags[number] & flag:
+                        self.listbox.itemconfig(row, foreground=color)
+                        break
+            row += 1
+
+    def set_filter(self, flags):
+        # show only the lines with any of flags, or all lines for 0, starting at the end
+        self.filter = flags
+        self.rows = array('I', self.index.matching(flags)) if flags else None
+        self.follow = True
+        self.load(self.total())
+        self.listbox.yview(tk.END)
+        self.update_scrollbar()
+
+    def find(self, query, backwards=False):
+        '''Select the next shown line after the one found last that contains every word of query.
+
+        Searches backwards from it with backwards=True and starts over at the other end.
+        Returns the number of the line among all matches and the number of matches, or None if there is none.
+        '''
+        matches = self.index.search(query)
+        if self.rows is not None:
+            matches = intersect(matches, self.rows)
+        if not matches:
+            return None
+
+        if self.found is None:
+            match = len(matches) - 1 if backwards else 0
+        elif backwards:
+            match = (bisect_left(matches, self.found) - 1) % len(matches)
+        else:
+            match = bisect_right(matches, self.found) % len(matches)
+        self.found = matches[match]
+
+        position = self.found if self.rows is None else bisect_left(self.rows, self.found)
+        self.show(position)
+        self.listbox.selection_clear(0, tk.END)
+        self.listbox.selection_set(position - self.first)
+        return match + 1, len(matches)
+
+    def show(self, index):
+        # scroll line index to the top of the listbox, paging it in if necessary
+        if not self.first <= index < self.first + self.size:
+            self.load(index - self.ring_size // 2)
+        self.listbox.yview(index - self.first)
+
+    def on_scrollbar(self, *args):
+        if args[0] == 'moveto':
+            self.show(int(float(args[1]) * self.total()))
+        else:
+            self.listbox.yview(*args)
+
+    def on_listbox_scroll(self, low, high):
+        low, high = float(low), float(high)
+        at_end = self.first + self.size == self.total()
+        self.follow = at_end and high >= 1.0
+        self.update_scrollbar(low, high)
+
+        # page in the neighbouring lines once the reader hits an edge of the window
+        if self.paging is None and ((low <= 0.0 and self.first > 0) or (high >= 1.0 and not at_end)):
+            self.paging = self.listbox.after_idle(self.page)
+
+    def page(self):
+        self.paging = None
+        top = self.first + int(self.listbox.nearest(0))
+        self.load(top - self.ring_size // 2)
+        self.listbox.yview(top - self.first)
+
+    def update_scrollbar(self, low=None, high=None):
+        if low is None:
+            low, high = (float(value) for value in self.listbox.yview())
+        total = self.total() or 1
+        self.scrollbar.set((self.first + low * self.size) / total, (self.first + high * self.size) / total)
+
+    def close(self):
+        if self.paging is not None:
+            self.listbox.after_cancel(self.paging)
+            self.paging = None
+        self.history.close()
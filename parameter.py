@@ -8,14 +8,22 @@ CONFIGURATION
     short: short variant of the name used in command line as '-e'
     long: long variant of the name used in command line as '--example'
     meta: variant of the name used for description
-    nargs: number of arguments, integer or '?' (for zero or one), '*' (for zero or more), '+' (for one or more)
+    nargs: number of arguments, integer or '?' (for zero or one), '*' (for zero or more), '+' (for one or more),
+           with '*' and '+' the values can also be read one per line from '@listfile' or '-' for stdin,
+           then main gets an iterable that verifies the values while reading them (see validation.StreamedItems)
     verify: function for validation of user input like the example below class definition
     help: text to describe the parameter displayed for help
     widget: widget type to be used for the gui
+    cache: number of verify results to keep per input value, 0 to verify every time (see validation.VerifyCache)
+    workers: number of threads verifying the values of a parameter with multiple arguments at the same time,
+             each taking chunks of the values, 1 verifies them one after the other
+    timeout: seconds after which the verification of one of multiple arguments is considered failed,
+             with workers=1 a value that takes longer still runs to its end before it fails
+    index: keep the listings of the directories walked to expand glob patterns in the values of a file,
+           dir or fileordir parameter with multiple arguments, so a re-run only lists changed directories
+           (see fswalk.TreeIndex)
 '''
 
-from inspect import signature
-
 ###############################################################################
 
 
@@ -23,7 +31,7 @@ class Parameter:
 
     used_flags=set()
 
-    def __init__(self, name, short=None, long=None, meta=None, nargs=1, default=None, verify=lambda value: value, help=None, widget='text'):
+    def __init__(self, name, short=None, long=None, meta=None, nargs=1, default=None, verify=lambda value: value, help=None, widget='text', cache=0, workers=8, timeout=None, index=False):
         self.name = name
 
         self.short = '-' + short if short is not None else None
@@ -45,12 +53,49 @@ class Parameter:
         self.value = default
         self.widget = widget if nargs != 0 else 'box'
         self.help = help
+        self.cache = cache
+        self.workers = workers
+        self.timeout = timeout
+        self.index = None
+        if index:
+            from .fswalk import TreeIndex
+            self.index = TreeIndex()
 
-        if len(signature(verify).parameters) == 1:
+        if count_parameters(verify) == 1:
             self.verify = verify
         else:
             raise ValueError("Function for verification of '%s' needs to have exactly 1 parameter." % self.name)
 
+    def cached(self, func):
+        # wrap func in a cache of its results, if enabled for this parameter
+        if not self.cache:
+            return func
+        from .validation import VerifyCache, FILESYSTEM_WIDGETS
+        return VerifyCache(func, self.cache, self.widget in FILESYSTEM_WIDGETS)
+
+    def verify_list(self, func, values):
+        # verify all values with func in parallel and raise one error for all that failed,
+        # or stream them from a list file or stdin
+        from .validation import verify_items, stream_source, StreamedItems, FILESYSTEM_WIDGETS
+        source = stream_source(values)
+        if source is not None and self.nargs in ['*', '+']:
+            return StreamedItems(func, source, self.workers, self.timeout)
+        if self.widget in FILESYSTEM_WIDGETS:
+            # glob patterns are replaced by the paths they match
+            from .fswalk import expand_values
+            values = expand_values(values, self.widget, self.workers, self.index)
+        return verify_items(func, values, self.workers, self.timeout)
+
+
+def count_parameters(func):
+    # read plain functions from their code object, as importing inspect costs more than all other imports
+    if type(func).__name__ == 'function' and not hasattr(func, '__wrapped__'):
+        code = func.__code__
+        return code.co_argcount + code.co_kwonlyargcount + bool(code.co_flags & 0x04) + bool(code.co_flags & 0x08)
+
+    from inspect import signature
+    return len(signature(func).parameters)
+
 
 def example_verify(value):
     if value is None:
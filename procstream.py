@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Streaming capture of the output of subprocesses.
+
+Each piped stream of a subprocess gets a reader thread that reads large chunks,
+decodes them incrementally so multi-byte characters split between two chunks survive,
+and forwards all complete lines of a chunk as one batch to a sink.
+
+usage:
+    - start the subprocesses with stdout=subprocess.PIPE and optionally stderr=subprocess.PIPE
+    - capture = OutputCapture(sink) with sink being a function that takes a list of lines
+    - capture.attach(process_handle) for every subprocess, then capture.wait(timeout)
+    - lines handed to the sink keep their terminator, '\r\n' is normalized to '\n'
+    - in a coroutine await run_async(args, sink) to start and capture a subprocess without blocking
+      the event loop, run(args, sink) does the same blocking
+'''
+
+import sys
+import time
+import codecs
+import locale
+import functools
+import threading
+import subprocess
+
+from .logpipe import LineAssembler
+from .capture import bind
+
+###############################################################################
+
+CHUNK_SIZE = 65536
+
+
+class LineSplitter:
+
+    def __init__(self, encoding, errors='replace'):
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+        self.assembler = LineAssembler()
+
+    def feed(self, data, final=False):
+        lines = [line + terminator for line, terminator in self.assembler.feed(self.decoder.decode(data, final))]
+        if final:
+            lines.extend(line + terminator for line, terminator in self.assembler.flush())
+            if self.assembler.length:
+                lines.append(self.assembler.take() + '\n')
+        return lines
+
+
+def write_lines(stream):
+    # create a sink that writes batches of lines to the current object of a stream in sys
+    def sink(lines):
+        getattr(sys, stream).write(''.join(lines))
+    return sink
+
+
+class OutputCapture:
+
+    def __init__(self, stdout=None, stderr=None, encoding=None, chunk_size=CHUNK_SIZE):
+        self.stdout = stdout or write_lines('stdout')
+        self.stderr = stderr or write_lines('stderr')
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.chunk_size = chunk_size
+        self.processes = []
+        self.threads = []
+
+    def attach(self, process_handle):
+        self.processes.append(process_handle)
+        for stream, sink in [(process_handle.stdout, self.stdout), (process_handle.stderr, self.stderr)]:
+            if stream is None:
+                continue
+            # the reader writes to the sinks of the job that attached the process
+            thread = threading.Thread(target=bind(self.pump), args=(stream, sink), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def pump(self, stream, sink):
+        # read the bytes below a text mode stream to decode them here in large chunks
+        stream = getattr(stream, 'buffer', stream)
+        read = getattr(stream, 'read1', stream.read)
+        splitter = LineSplitter(self.encoding)
+        try:
+            while True:
+                data = read(self.chunk_size)
+                lines = splitter.feed(data, final=not data)
+                if lines:
+                    sink(lines)
+                if not data:
+                    break
+        finally:
+            stream.close()
+
+    def wait(self, timeout=None):
+        '''Wait for all attached subprocesses and the output they wrote.
+
+        Returns the return codes in the order the subprocesses were attached. If they are not
+        done within timeout seconds, the remaining ones are killed and TimeoutExpired is raised.
+        '''
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            for process_handle in self.processes:
+                remaining = None if deadline is None else max(0, deadline - time.monotonic())
+                process_handle.wait(remaining)
+        except subprocess.TimeoutExpired as e:
+            for process_handle in self.processes:
+                if process_handle.poll() is None:
+                    process_handle.kill()
+                    process_handle.wait()
+            self.join()
+            raise subprocess.TimeoutExpired(e.cmd, timeout)
+        self.join()
+        return [process_handle.returncode for process_handle in self.processes]
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+
+
+def run(args, stdout=None, stderr=None, encoding=None, timeout=None, **kwargs):
+    # start a subprocess, pass its output to the sinks and return its return code
+    process_handle = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+    capture = OutputCapture(stdout, stderr, encoding)
+    capture.attach(process_handle)
+    return capture.wait(timeout)[0]
+
+
+async def run_async(args, stdout=None, stderr=None, encoding=None, timeout=None, chunk_size=CHUNK_SIZE, **kwargs):
+    '''Start a subprocess on the running event loop, pass its output to the sinks and return its return code.
+
+    args is a list for the program and its arguments or a string for the shell. If the subprocess isn't done
+    within timeout seconds, it is killed and TimeoutExpired is raised.
+    '''
+    import asyncio
+    if sys.version_info < (3, 8):
+        # python 3.7 only watches subprocesses from the loop of the main thread,
+        # so the subprocess is waited for on a thread instead
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, bind(functools.partial(run, args, stdout, stderr, encoding, timeout,
+                                                                       **kwargs)))
+
+    stdout = stdout or write_lines('stdout')
+    stderr = stderr or write_lines('stderr')
+    encoding = encoding or locale.getpreferredencoding(False)
+    if isinstance(args, str):
+        process = await asyncio.create_subprocess_shell(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+    else:
+        process = await asyncio.create_subprocess_exec(*args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                                       **kwargs)
+
+    readers = [pump_async(process.stdout, stdout, encoding, chunk_size),
+               pump_async(process.stderr, stderr, encoding, chunk_size)]
+    try:
+        await asyncio.wait_for(asyncio.gather(process.wait(), *readers), timeout)
+    except asyncio.TimeoutError:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise subprocess.TimeoutExpired(args, timeout)
+    return process.returncode
+
+
+async def pump_async(stream, sink, encoding, chunk_size):
+    splitter = LineSplitter(encoding)
+    while True:
+        data = await stream.read(chunk_size)
+        lines = splitter.feed(data, final=not data)
+        if lines:
+            sink(lines)
+        if not data:
+            break
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Profiling of the main function with cProfile and tracemalloc.
+
+A Profiler times named phases of a run, like the parsing of the arguments, the verification
+of each parameter and main itself. Its run() calls a function under cProfile, tracemalloc or both,
+writes the statistics to a .pstats file and the allocations to a snapshot file, which can be loaded
+with pstats.Stats and tracemalloc.Snapshot.load, and report() prints the top hotspots and the phases.
+
+cProfile only follows the thread calling run(), while tracemalloc sees the allocations of all threads,
+including other jobs running at the same time.
+'''
+
+import os
+import sys
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+###############################################################################
+
+PROFILE_SUFFIX = '.pstats'
+TRACE_SUFFIX = '.alloc'
+
+
+class Profiler:
+
+    # number of functions and allocation sites in the report
+    top = 15
+
+    def __init__(self, profile_path=None, trace_path=None):
+        self.profile_path = profile_path
+        self.trace_path = trace_path
+        self.phases = OrderedDict()
+        self.stats = None
+        self.snapshot = None
+        self.peak = None
+        self.notes = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - start
+
+    def timed(self, name, func):
+        # sum up the time of all calls of func as phase name
+        def wrapped(*args, **kwargs):
+            with self.phase(name):
+                return func(*args, **kwargs)
+        return wrapped
+
+    def run(self, func, *args, **kwargs):
+        profile = None
+        if self.profile_path is not None:
+            import cProfile
+            profile = cProfile.Profile()
+
+        tracing = False
+        if self.trace_path is not None:
+            import tracemalloc
+            # a job running at the same time may trace already, then it also stops tracing
+            tracing = not tracemalloc.is_tracing()
+            if tracing:
+                tracemalloc.start()
+
+        try:
+            with self.phase('main'):
+                if profile is None:
+                    return func(*args, **kwargs)
+                try:
+                    profile.enable()
+                except ValueError as e:
+                    # newer versions of python allow only one profiler per process
+                    self.notes.append("not profiled: %s" % e)
+                    profile = None
+                    return func(*args, **kwargs)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    profile.disable()
+        finally:
+            if profile is not None:
+                profile.dump_stats(self.profile_path)
+                self.stats = profile
+            if self.trace_path is not None and tracemalloc.is_tracing():
+                self.peak = tracemalloc.get_traced_memory()[1]
+                self.snapshot = tracemalloc.take_snapshot()
+                self.snapshot.dump(self.trace_path)
+            elif self.trace_path is not None:
+                self.notes.append("allocations not traced, another job stopped tracing")
+            if tracing:
+                tracemalloc.stop()
+
+    def report(self, stream=None):
+        stream = sys.stderr if stream is None else stream
+        if self.stats is not None:
+            import pstats
+            stream.write("profile written to %s\n" % self.profile_path)
+            pstats.Stats(self.stats, stream=stream).sort_stats('cumulative').print_stats(self.top)
+        if self.snapshot is not None:
+            import tracemalloc
+            stream.write("allocations written to %s, peak %.1f MB, top %d still allocated:\n" % (
+                self.trace_path, self.peak / (1024 * 1024), self.top))
+            # leave out what the profilers allocated themselves
+            snapshot = self.snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__),
+                                                    tracemalloc.Filter(False, __file__),
+                                                    tracemalloc.Filter(False, '*/cProfile.py'),
+                                                    tracemalloc.Filter(False, '<frozen importlib._bootstrap*>')])
+            for statistic in snapshot.statistics('lineno')[:self.top]:
+                stream.write("    %s\n" % statistic)
+        for note in self.notes:
+            stream.write(note + '\n')
+        if self.phases:
+            stream.write("phases:\n")
+            for name, seconds in self.phases.items():
+                stream.write("    %-30s %10.3f s\n" % (name, seconds))
+
+
+def default_paths(script, suffix=''):
+    # file names in the working directory named after the script
+    name = os.path.splitext(os.path.basename(script))[0] or 'main'
+    return name + suffix + PROFILE_SUFFIX, name + suffix + TRACE_SUFFIX
+
+
+def pop_arguments(argv, reserved=()):
+    '''Remove "--profile[=path]" and "--trace-alloc[=path]" from argv and return both paths.
+
+    A path is None if its flag isn't given. Flags in reserved belong to the parameters of the script
+    and are left alone.
+    '''
+    from .cliparser import pop_options
+    found = pop_options(argv, {'--profile': '?', '--trace-alloc': '?'}, reserved)
+    paths = []
+    for name, default in zip(['--profile', '--trace-alloc'], default_paths(argv[0] if argv else '')):
+        paths.append(None if name not in found else found[name] or default)
+    return tuple(paths)
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Progress reporting for the main function, cheap enough to be called for every item.
+
+A Progress only counts in plain attributes, so advance() takes no lock and never touches the UI.
+The thread that shows the progress, the log window of the GUI or a TextReporter on the console,
+calls sample() at its own pace, which also derives the items per second and the remaining time.
+
+usage:
+    - progress = current() returns the progress of the running job or command line call
+    - progress.set(0, total) if the number of items is known, then progress.advance() per item
+    - with progress.subtask(total, weight=n) as task: ... reports the progress of n items
+      of the parent in more detail, e.g. for a thread of its own or a nested loop
+
+A Progress should only be advanced by one thread, use a subtask for every further thread.
+A Progress without a total of its own, like the one of a job whose main function never sets it,
+takes the weights of its sub-tasks as total and shows the items counted by them.
+
+Worker processes can't reach the Progress of the job, so progress.shared(total, slots=n) creates a
+SharedProgress whose count is kept in a multiprocessing.RawArray with one slot per worker process.
+Start the pool with initializer=shared.initializer and initargs=shared.initargs, then current()
+in a worker returns a Progress that advances the slot of its process without any lock or pipe.
+Every process started takes a slot of its own, so slots must be at least the number of processes
+the pool starts, by default os.cpu_count() like the pools themselves, or the initializer fails.
+Only the count of a worker is shared, its total and sub-tasks stay in the worker.
+'''
+
+import os
+import sys
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+###############################################################################
+
+active = contextvars.ContextVar('progress', default=None)
+
+
+class Progress:
+
+    # weight of the latest rate against the previous ones
+    smoothing = 0.3
+    # set by the instance on the first advance, a shared count isn't reset by __init__
+    count = 0
+
+    def __init__(self, total=None, name=None, weight=1):
+        self.total = total
+        self.name = name
+        self.weight = weight
+        # weight and items of the closed sub-tasks, only changed under the lock
+        self.done = 0
+        self.finished = 0
+        self.parent = None
+        self.children = []
+        self.closed = False
+        self.lock = threading.Lock()
+
+        # only used by the thread calling sample()
+        self.last_time = None
+        self.last_count = 0
+        self.last_fraction = None
+        self.rate = None
+        self.fraction_rate = None
+
+    def advance(self, count=1):
+        self.count += count
+
+    def set(self, count, total=None):
+        if total is not None:
+            self.total = total
+        self.count = count
+
+    def subtask(self, total=None, name=None, weight=1):
+        return self.add_child(Progress(total, name, weight))
+
+    def shared(self, total=None, name=None, weight=1, slots=None):
+        # a sub-task advanced by worker processes
+        return self.add_child(SharedProgress(total, name, weight, slots))
+
+    def add_child(self, child):
+        child.parent = self
+        with self.lock:
+            self.children = self.children + [child]
+        return child
+
+    def close(self):
+        # a finished sub-task counts with its full weight for the parent
+        if self.closed:
+            return
+        self.closed = True
+        if self.parent is not None:
+            with self.parent.lock:
+                self.parent.done += self.weight
+                self.parent.finished += self.items()
+                self.parent.children = [child for child in self.parent.children if child is not self]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def touched(self):
+        return self.count > 0 or self.done > 0 or self.total is not None or bool(self.children)
+
+    def items(self):
+        # the items counted, without a total of its own also those of the sub-tasks
+        if self.total:
+            return self.count
+        return self.count + self.finished + sum(child.items() for child in self.children)
+
+    def fraction(self):
+        # between 0 and 1, or None as long as the total is unknown
+        if self.closed:
+            return 1.0
+        children = self.children
+        total = self.total
+        if not total:
+            if not children and not self.done:
+                return None
+            # the sub-tasks make up the total, items counted directly are done
+            total = self.count + self.done + sum(child.weight for child in children)
+        partial = 0
+        for child in children:
+            child_fraction = child.fraction()
+            if child_fraction is not None:
+                partial += child_fraction * child.weight
+        return max(0.0, min(1.0, (self.count + self.done + partial) / total))
+
+    def sample(self):
+        now = time.monotonic()
+        count = self.count + self.done if self.total else self.items()
+        fraction = self.fraction()
+        if self.last_time is not None and now > self.last_time:
+            elapsed = now - self.last_time
+            self.rate = smooth(self.rate, (count - self.last_count) / elapsed, self.smoothing)
+            if fraction is not None and self.last_fraction is not None:
+                self.fraction_rate = smooth(self.fraction_rate, (fraction - self.last_fraction) / elapsed,
+                                            self.smoothing)
+        self.last_time = now
+        self.last_count = count
+        self.last_fraction = fraction
+        return fraction
+
+    def eta(self):
+        # remaining seconds as estimated by the last samples, None if unknown
+        if self.last_fraction is None or not self.fraction_rate or self.fraction_rate <= 0:
+            return None
+        return (1 - self.last_fraction) / self.fraction_rate
+
+    def describe(self):
+        parts = [self.name] if self.name else []
+        if self.last_fraction is not None:
+            parts.append('%d%%' % (100 * self.last_fraction))
+        count = self.last_count
+        parts.append('%d/%d' % (count, self.total) if self.total else '%d' % count)
+        if self.rate is not None:
+            parts.append('%.1f/s' % self.rate)
+        eta = self.eta()
+        if eta is not None:
+            parts.append('ETA %s' % format_duration(eta))
+        return ' '.join(parts)
+
+
+class SharedProgress(Progress):
+
+    def __init__(self, total=None, name=None, weight=1, slots=None):
+        import multiprocessing
+        # one slot per worker process, so each slot has a single writer
+        self.values = multiprocessing.RawArray('q', slots or os.cpu_count() or 1)
+        self.next_slot = multiprocessing.Value('i', 0)
+        self.base = 0
+        Progress.__init__(self, total, name, weight)
+
+    @property
+    def count(self):
+        return self.base + sum(self.values)
+
+    @count.setter
+    def count(self, value):
+        self.base = value - sum(self.values)
+
+    @property
+    def initializer(self):
+        return attach_worker
+
+    @property
+    def initargs(self):
+        return self.values, self.next_slot
+
+
+class WorkerProgress(Progress):
+
+    def __init__(self, values, slot):
+        self.values = values
+        self.slot = slot
+        Progress.__init__(self)
+
+    @property
+    def count(self):
+        return self.values[self.slot]
+
+    @count.setter
+    def count(self, value):
+        self.values[self.slot] = value
+
+    def advance(self, count=1):
+        self.values[self.slot] += count
+
+
+# the progress of this process, if it was started as worker of a SharedProgress
+worker = None
+
+
+def attach_worker(values, next_slot):
+    # initializer of a worker process, a slot written by two processes would lose counts
+    global worker
+    with next_slot.get_lock():
+        slot = next_slot.value
+        next_slot.value += 1
+    if slot >= len(values):
+        raise ValueError("more worker processes than the %d slots of the SharedProgress" % len(values))
+    worker = WorkerProgress(values, slot)
+
+
+def smooth(old, new, smoothing):
+    return new if old is None else old + smoothing * (new - old)
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds + 0.5), 60)
+    hours, minutes = divmod(minutes, 60)
+    return '%d:%02d:%02d' % (hours, minutes, seconds)
+
+
+def current():
+    # the progress of the worker process or running job, or one nobody looks at otherwise,
+    # a forked worker also inherits the context of the job, which is only a copy there
+    if worker is not None:
+        return worker
+    progress = active.get()
+    return progress if progress is not None else Progress()
+
+
+@contextmanager
+def activate(progress):
+    token = active.set(progress)
+    try:
+        yield progress
+    finally:
+        active.reset(token)
+
+
+class TextReporter:
+
+    def __init__(self, progress, stream=None, interval=0.5):
+        self.progress = progress
+        self.stream = sys.stderr if stream is None else stream
+        self.interval = interval
+        self.width = 0
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        # only a terminal can overwrite the line, elsewhere the progress would just flood the output
+        isatty = getattr(self.stream, 'isatty', None)
+        if isatty is not None and isatty():
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        return self
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.render()
+
+    def render(self):
+        self.progress.sample()
+        if not self.progress.touched:
+            return
+        text = self.progress.describe()
+        self.stream.write('\r' + text.ljust(self.width))
+        self.stream.flush()
+        self.width = len(text)
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            if self.width:
+                self.render()
+                self.stream.write('\n')
+                self.stream.flush()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
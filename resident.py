@@ -0,0 +1,404 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Resident server that keeps a script and its parser warm between calls from the command line.
+
+With GenericUI(..., resident=True) the first call from the command line forks a daemon from the already
+imported script, which listens on a Unix domain socket, and runs itself as usual. Later calls forward
+their arguments, working directory, environment and their stdin, stdout and stderr, passed as file
+descriptors, to the daemon and exit with the exit code it sends back.
+
+Every request runs in a child forked from the daemon, so requests can't change the state of each other
+and the daemon, and a crash only ends that request. At most workers requests run at the same time,
+further ones wait in the backlog of the socket. The daemon exits after idle_timeout seconds without
+requests and as soon as the script changed, the call that notices it starts a new daemon.
+
+The script itself still starts python and imports its modules before it forwards. To skip that as well,
+call "python -m package.resident script.py arguments", which only imports the standard library
+and runs the script itself if no daemon is there.
+
+The request is encoded with marshal, which needs no import, in its version 4, which python 3.4 and later share.
+
+As a call hands its environment and terminal to the daemon, the socket has to be in a directory that only
+belongs to the user, by default genui-<uid> in XDG_RUNTIME_DIR, TMPDIR or /tmp, created with mode 0700.
+A socket in a directory that others can access or that belongs to someone else is not used at all.
+Where the system tells the user of the other end of a connection (SO_PEERCRED), the client and the daemon
+also refuse to talk to a process of another user.
+
+Only available where os.fork, Unix domain sockets and passing file descriptors exist, so not on Windows.
+'''
+
+import os
+import sys
+import array
+import socket
+import struct
+import marshal
+
+# the client only imports what it needs to forward a call, the modules of the server are imported in there
+
+###############################################################################
+
+MARSHAL_VERSION = 4
+HEADER = struct.Struct('!I')
+EXIT_CODE = struct.Struct('!i')
+# exit code sent back if the daemon runs an outdated version of the script
+STALE = -1
+
+
+def available():
+    return hasattr(os, 'fork') and hasattr(socket, 'AF_UNIX') and hasattr(socket, 'SCM_RIGHTS')
+
+
+def default_path(script):
+    # one socket per script in a directory of the user, which is created if it doesn't exist yet
+    base = os.environ.get('XDG_RUNTIME_DIR') or os.environ.get('TMPDIR') or '/tmp'
+    directory = os.path.join(base, 'genui-%d' % os.getuid())
+    try:
+        os.mkdir(directory, 0o700)
+    except OSError:
+        # it exists already, is_private tells whether it can be used
+        pass
+    name = os.path.splitext(os.path.basename(script))[0]
+    return os.path.join(directory, name + '.sock')
+
+
+def is_private(path):
+    # whether the directory of the socket at path is a real directory only the user has access to
+    import stat
+    try:
+        status = os.lstat(os.path.dirname(os.path.abspath(path)))
+    except OSError:
+        return False
+    return stat.S_ISDIR(status.st_mode) and status.st_uid == os.getuid() and not status.st_mode & 0o077
+
+
+def is_own_socket(path):
+    import stat
+    try:
+        status = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(status.st_mode) and status.st_uid == os.getuid()
+
+
+def peer_uid(connection):
+    # user of the process at the other end of the connection, or None where the system doesn't tell
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+    credentials = struct.Struct('3i')
+    pid, uid, gid = credentials.unpack(connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED,
+                                                             credentials.size))
+    return uid
+
+
+def is_own_peer(connection):
+    uid = peer_uid(connection)
+    return uid is None or uid == os.getuid()
+
+
+def script_key(script):
+    # requests are only served by a daemon started from the same version of the script
+    try:
+        status = os.stat(script)
+    except OSError:
+        return None
+    return [os.path.abspath(script), status.st_mtime_ns, status.st_size]
+
+
+def receive_exactly(connection, size):
+    data = b''
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def forward(path, argv=None):
+    '''Run the call on the daemon listening on path and return its exit code.
+
+    Returns None if there is no daemon or it runs an outdated script, then the caller runs itself.
+    '''
+    argv = sys.argv if argv is None else argv
+    if not available() or not is_private(path) or not is_own_socket(path):
+        return None
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(path)
+        if not is_own_peer(connection):
+            # the environment and the terminal are only handed to a daemon of the same user
+            connection.close()
+            return None
+    except OSError:
+        connection.close()
+        return None
+
+    for stream in [sys.stdout, sys.stderr]:
+        stream.flush()
+    request = marshal.dumps({'argv': list(argv), 'cwd': os.getcwd(), 'env': dict(os.environ),
+                             'key': script_key(argv[0])}, MARSHAL_VERSION)
+    try:
+        connection.sendmsg([HEADER.pack(len(request))],
+                           [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', [0, 1, 2]))])
+        connection.sendall(request)
+        data = receive_exactly(connection, EXIT_CODE.size)
+    except KeyboardInterrupt:
+        # closing the connection interrupts the request in the daemon as well
+        connection.close()
+        return 130
+    except OSError:
+        connection.close()
+        return None
+    connection.close()
+
+    if data is None:
+        # the child serving the request died without an exit code
+        return 1
+    code = EXIT_CODE.unpack(data)[0]
+    return None if code == STALE else code
+
+
+class ResidentServer:
+
+    def __init__(self, handler, path, key, idle_timeout=600, workers=8):
+        self.handler = handler
+        self.path = path
+        self.key = key
+        self.idle_timeout = idle_timeout
+        self.workers = workers
+        self.children = set()
+        self.listener = None
+
+    def bind(self):
+        import errno
+        if not is_private(self.path):
+            return False
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o077)
+        try:
+            listener.bind(self.path)
+        except OSError as e:
+            if e.errno != errno.EADDRINUSE or forward_probe(self.path):
+                listener.close()
+                return False
+            # a daemon that crashed left its socket behind
+            os.unlink(self.path)
+            listener.bind(self.path)
+        finally:
+            os.umask(umask)
+        listener.listen(64)
+        self.listener = listener
+        return True
+
+    def serve(self):
+        import select
+        import signal
+        if not self.bind():
+            return
+        # a finished child wakes up select through the pipe, so a free slot is used right away
+        wake_read, wake_write = os.pipe()
+        os.set_blocking(wake_write, False)
+        signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+        signal.set_wakeup_fd(wake_write)
+        try:
+            while True:
+                self.reap()
+                readable = [wake_read]
+                if len(self.children) < self.workers:
+                    readable.append(self.listener)
+                timeout = None if self.children else self.idle_timeout
+                ready = select.select(readable, [], [], timeout)[0]
+                if not ready:
+                    break
+                if wake_read in ready:
+                    os.read(wake_read, 512)
+                if self.listener in ready and not self.accept():
+                    break
+        finally:
+            self.close()
+            signal.set_wakeup_fd(-1)
+            os.close(wake_read)
+            os.close(wake_write)
+            # let running requests finish
+            while self.children:
+                self.children.discard(os.waitpid(-1, 0)[0])
+
+    def reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+            self.children.discard(pid)
+
+    def accept(self):
+        # returns False if the daemon has to stop
+        connection = self.listener.accept()[0]
+        fds = []
+        try:
+            if not is_own_peer(connection):
+                return True
+            data, ancillary, flags, address = connection.recvmsg(HEADER.size, socket.CMSG_SPACE(3 * 4))
+            for level, kind, payload in ancillary:
+                if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                    fds.extend(array.array('i', payload[:len(payload) - len(payload) % 4]))
+            if len(data) != HEADER.size or len(fds) != 3:
+                return True
+            request = receive_exactly(connection, HEADER.unpack(data)[0])
+            if request is None:
+                return True
+            request = marshal.loads(request)
+
+            if request['key'] != self.key:
+                # give way to a daemon of the new version
+                self.close()
+                connection.sendall(EXIT_CODE.pack(STALE))
+                return False
+
+            pid = os.fork()
+            if pid == 0:
+                self.run_child(connection, fds, request)
+            self.children.add(pid)
+            return True
+        except (OSError, ValueError, EOFError, TypeError, KeyError):
+            # a broken request only ends its connection
+            return True
+        finally:
+            for fd in fds:
+                os.close(fd)
+            connection.close()
+
+    def run_child(self, connection, fds, request):
+        import signal
+        import threading
+        import traceback
+        code = 1
+        try:
+            signal.set_wakeup_fd(-1)
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            self.listener.close()
+            for fd, target in zip(fds, [0, 1, 2]):
+                os.dup2(fd, target)
+            os.chdir(request['cwd'])
+            os.environ.clear()
+            os.environ.update(request['env'])
+            sys.argv[:] = request['argv']
+            threading.Thread(target=watch_client, args=(connection,), daemon=True).start()
+            code = run_handler(self.handler)
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                connection.sendall(EXIT_CODE.pack(code))
+            except BaseException:
+                pass
+            os._exit(code)
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+def forward_probe(path):
+    # whether a daemon accepts connections on path
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+def watch_client(connection):
+    import signal
+    # the client never sends anything after the request, so data or its end means it was interrupted
+    try:
+        connection.recv(1)
+    except OSError:
+        pass
+    os.kill(os.getpid(), signal.SIGINT)
+
+
+def run_handler(handler):
+    import traceback
+    try:
+        handler()
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        sys.stderr.write('%s\n' % e.code)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    except Exception:
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+def start_daemon(handler, path, idle_timeout=600, workers=8, prepare=None):
+    '''Fork a daemon that serves the calls of the script with handler.
+
+    prepare is called in the daemon before it serves, to warm up what the requests need.
+    Returns whether a daemon was started, the calling process goes on as before.
+    '''
+    if not available() or not is_private(path):
+        return False
+    key = script_key(sys.argv[0])
+    for stream in [sys.stdout, sys.stderr]:
+        stream.flush()
+    pid = os.fork()
+    if pid:
+        os.waitpid(pid, 0)
+        return True
+
+    # detach twice, so the daemon has no terminal and isn't a child of the caller
+    try:
+        os.setsid()
+        if os.fork():
+            os._exit(0)
+        # the daemon must not keep the pipes of the caller open
+        null = os.open(os.devnull, os.O_RDWR)
+        for target in [0, 1, 2]:
+            os.dup2(null, target)
+        os.close(null)
+        os.chdir('/')
+        if prepare is not None:
+            try:
+                prepare()
+            except Exception:
+                # only a warm up, the requests report the error themselves
+                pass
+        ResidentServer(handler, path, key, idle_timeout, workers).serve()
+    finally:
+        os._exit(0)
+
+
+if __name__ == '__main__':
+    # thin client: python -m package.resident script.py arguments
+    if len(sys.argv) < 2:
+        sys.stderr.write("usage: python -m package.resident script.py [arguments]\n")
+        sys.exit(2)
+    argv = sys.argv[1:]
+    code = forward(default_path(argv[0]), argv)
+    if code is None:
+        # no daemon yet, the script starts one
+        os.execv(sys.executable, [sys.executable] + argv)
+    sys.exit(code)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Sampling of the resources used by the process and its children while main runs.
+
+A ResourceMonitor samples in a background thread every interval seconds the CPU usage, resident memory,
+number of threads and processes and the read and write rates of the process tree. The samples are shown
+in the log window of the GUI, summarized in a table at the end of a run from the command line
+and can be written to a CSV file to compare runs.
+
+The monitor needs psutil, which is optional. Without it the monitor is not available and does nothing.
+'''
+
+import os
+import csv
+import time
+import threading
+from collections import deque, namedtuple
+
+###############################################################################
+
+MEGABYTE = 1024 * 1024
+
+# cpu in percent of one core, memory in bytes and rates in bytes per second
+Sample = namedtuple('Sample', ['time', 'cpu', 'rss', 'peak_rss', 'threads', 'processes', 'read_rate', 'write_rate'])
+
+SUMMARY_FIELDS = [('cpu', 'CPU %', 1), ('rss', 'RSS MB', MEGABYTE), ('threads', 'threads', 1),
+                  ('processes', 'processes', 1), ('read_rate', 'read MB/s', MEGABYTE),
+                  ('write_rate', 'write MB/s', MEGABYTE)]
+
+
+def load_psutil():
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil
+
+
+class ResourceMonitor:
+
+    def __init__(self, interval=1.0, history=3600, pid=None):
+        self.interval = interval
+        self.pid = os.getpid() if pid is None else pid
+        self.samples = deque(maxlen=history)
+        self.peak_rss = 0
+        self.started = None
+        # psutil.Process objects are kept between samples, as cpu_percent compares to the previous call
+        self.processes = {}
+        self.last_io = None
+        self.stopped = threading.Event()
+        self.thread = None
+        self.psutil = load_psutil()
+
+    @property
+    def available(self):
+        return self.psutil is not None
+
+    @property
+    def latest(self):
+        return self.samples[-1] if self.samples else None
+
+    def start(self):
+        if self.available and self.thread is None:
+            self.started = time.monotonic()
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        return self
+
+    def run(self):
+        self.sample()
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+            # the last sample covers the end of the run
+            self.sample()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def update_processes(self):
+        psutil = self.psutil
+        root = self.processes.get(self.pid)
+        if root is None:
+            root = psutil.Process(self.pid)
+        try:
+            children = root.children(recursive=True)
+        except psutil.Error:
+            children = []
+        self.processes = {process.pid: self.processes.get(process.pid, process) for process in [root] + children}
+
+    def sample(self):
+        psutil = self.psutil
+        self.update_processes()
+        cpu = rss = threads = read = write = 0
+        count = 0
+        for process in self.processes.values():
+            try:
+                with process.oneshot():
+                    cpu += process.cpu_percent()
+                    rss += process.memory_info().rss
+                    threads += process.num_threads()
+                    # io_counters is missing on macOS
+                    if hasattr(process, 'io_counters'):
+                        counters = process.io_counters()
+                        read += counters.read_bytes
+                        write += counters.write_bytes
+                count += 1
+            except psutil.Error:
+                continue
+
+        now = time.monotonic()
+        read_rate = write_rate = 0
+        if self.last_io is not None and now > self.last_io[0]:
+            elapsed = now - self.last_io[0]
+            # counters of children that ended are gone, so the sums can drop
+            read_rate = max(0, read - self.last_io[1]) / elapsed
+            write_rate = max(0, write - self.last_io[2]) / elapsed
+        self.last_io = now, read, write
+        self.peak_rss = max(self.peak_rss, rss)
+
+        sample = Sample(now - self.started if self.started is not None else 0, cpu, rss, self.peak_rss,
+                        threads, count, read_rate, write_rate)
+        self.samples.append(sample)
+        return sample
+
+    def summary(self):
+        # rows of name, minimum, average and maximum of every field
+        rows = []
+        samples = list(self.samples)
+        if not samples:
+            return rows
+        for field, name, unit in SUMMARY_FIELDS:
+            values = [getattr(sample, field) / unit for sample in samples]
+            rows.append((name, min(values), sum(values) / len(values), max(values)))
+        return rows
+
+    def format_summary(self):
+        rows = self.summary()
+        if not rows:
+            return "no resource samples"
+        lines = ['%-12s %10s %10s %10s' % ('', 'min', 'avg', 'max')]
+        for name, minimum, average, maximum in rows:
+            lines.append('%-12s %10.1f %10.1f %10.1f' % (name, minimum, average, maximum))
+        lines.append('peak RSS %.1f MB over %d samples' % (self.peak_rss / MEGABYTE, len(self.samples)))
+        return '\n'.join(lines)
+
+    def write_csv(self, path):
+        with open(path, 'w', newline='') as output:
+            writer = csv.writer(output)
+            writer.writerow(Sample._fields)
+            writer.writerows(list(self.samples))
+
+
+def describe(sample):
+    return "CPU %.0f%%  RSS %.1f MB (peak %.1f MB)  threads %d  processes %d  read %.1f MB/s  write %.1f MB/s" % (
+        sample.cpu, sample.rss / MEGABYTE, sample.peak_rss / MEGABYTE, sample.threads, sample.processes,
+        sample.read_rate / MEGABYTE, sample.write_rate / MEGABYTE)
+
+
+def pop_arguments(argv, reserved=()):
+    '''Remove the monitor arguments from argv and return the interval and the CSV path.
+
+    The interval is None if the monitor isn't requested by "--monitor" or "--monitor-csv".
+    Flags in reserved belong to the parameters of the script and are left alone.
+    '''
+    from .cliparser import pop_options
+    # the interval is optional
+    found = pop_options(argv, {'--monitor': '?', '--monitor-csv': 1}, reserved)
+    path = found.get('--monitor-csv')
+    if '--monitor' not in found:
+        return (1.0, path) if path is not None else (None, None)
+    interval = found['--monitor'] or '1'
+    try:
+        interval = float(interval)
+    except ValueError:
+        raise ValueError("argument --monitor: %r is no number" % interval)
+    if interval <= 0:
+        raise ValueError("argument --monitor: %r is no positive number" % interval)
+    return interval, path
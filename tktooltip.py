@@ -4,7 +4,11 @@
 '''Class for creating a tkinter tool tip.
 
 The tool tip can be attached to any widget's mouse enter and leave events.
-It displays the given text wrapped in a box of high contrast.
+It displays the given text wrapped in a box of high contrast once the pointer rested on the widget for delay milliseconds.
+
+All tool tips of an application share one window, which is hidden and shown again instead of created per hover.
+Creating a ToolTip for a widget that has one already just replaces its text, so it can be done as often as needed,
+a text that is empty or False removes the tool tip.
 '''
 
 import tkinter as tk
@@ -14,30 +18,97 @@ import tkinter as tk
 
 class ToolTip(object):
 
+    # milliseconds the pointer has to rest on a widget before its tool tip shows up
+    delay = 500
+
     def __init__(self, widget, text='tool tip'):
         self.widget = widget
         self.text = text
-        if not self.text:
-            self.widget.unbind('<Enter>')
-            self.widget.unbind('<Leave>')
+        self.timer = None
+
+        # bind the events only once per widget, they are handled by its latest tool tip
+        previous = getattr(widget, 'tooltip', None)
+        widget.tooltip = self
+        if previous is None:
+            widget.bind('<Enter>', lambda event: widget.tooltip.enter(event), add='+')
+            widget.bind('<Leave>', lambda event: widget.tooltip.close(event), add='+')
+            widget.bind('<ButtonPress>', lambda event: widget.tooltip.close(event), add='+')
         else:
-            self.widget.bind('<Enter>', self.enter)
-            self.widget.bind('<Leave>', self.close)
+            previous.cancel()
+            # a tool tip on display shows the new text right away
+            window = shared_window(widget, create=False)
+            if window is not None and window.owner is widget:
+                if self.text:
+                    window.update(self.text)
+                else:
+                    window.hide()
 
     def enter(self, event=None):
-        x = y = 0
-        x, y, cx, cy = self.widget.bbox('insert')
-        x += self.widget.winfo_rootx() + 25
-        y += self.widget.winfo_rooty() + 20
+        self.cancel()
+        if not self.text:
+            return
+        if event is not None:
+            x, y = event.x_root, event.y_root
+        else:
+            x, y = self.widget.winfo_rootx(), self.widget.winfo_rooty()
+        self.timer = self.widget.after(self.delay, self.show, x + 15, y + 20)
+
+    def show(self, x, y):
+        self.timer = None
+        shared_window(self.widget).show(self.widget, self.text, x, y)
+
+    def cancel(self):
+        if self.timer is not None:
+            self.widget.after_cancel(self.timer)
+            self.timer = None
+
+    def close(self, event=None):
+        self.cancel()
+        window = shared_window(self.widget, create=False)
+        if window is not None and window.owner is self.widget:
+            window.hide()
+
 
-        # create a "window" that is just a label
-        self.window = tk.Toplevel(self.widget)
+class TipWindow(object):
+
+    def __init__(self, root):
+        # a "window" that is just a label
+        self.window = tk.Toplevel(root)
         self.window.wm_overrideredirect(True)
-        self.window.wm_geometry('+%d+%d' % (x, y))
-        label = tk.Label(self.window, text=self.text, justify='left', padx=4, pady=2, wraplength=250,
+        self.window.withdraw()
+        self.label = tk.Label(self.window, justify='left', padx=4, pady=2, wraplength=250,
             background='bisque', foreground='black', relief='flat', borderwidth=0)
-        label.pack(ipadx=1)
+        self.label.pack(ipadx=1)
+        self.owner = None
 
-    def close(self, event=None):
-        if self.window:
-            self.window.destroy()
+    def show(self, owner, text, x, y):
+        self.owner = owner
+        self.label.config(text=text)
+        self.window.wm_geometry('+%d+%d' % (x, y))
+        self.window.deiconify()
+        self.window.lift()
+
+    def update(self, text):
+        self.label.config(text=text)
+
+    def hide(self):
+        self.owner = None
+        self.window.withdraw()
+
+
+# one window per tkinter root
+windows = {}
+
+
+def shared_window(widget, create=True):
+    root = widget.nametowidget('.')
+    window = windows.get(root)
+    if window is not None:
+        try:
+            window.window.winfo_exists()
+        except tk.TclError:
+            # the root was destroyed meanwhile
+            window = None
+    if window is None and create:
+        window = windows[root] = TipWindow(root)
+    return window
@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Helpers to run the verify functions of Parameter objects.
+
+VerifyCache memoizes the results of a verify function per input value, including the exceptions
+it raised, and evicts the least recently used value once it holds more than size values.
+For the filesystem widgets the status of the path is stored along with each result, so a file
+that was created, removed or modified since is verified again.
+
+verify_items verifies the values of a parameter with multiple arguments on a pool of threads,
+as the checks are mostly waiting for the filesystem or network, and reports all failed values at once.
+Each thread gets a few chunks of values, so a cheap check doesn't pay for a future per value,
+only with a timeout every value gets a thread of its own to be given up on by itself. A value given up on
+leaves its thread behind, hanging on a stalled mount for example, and frees its place for the next value.
+
+Instead of the values themselves a single "@listfile" or "-" for stdin can be given, then StreamedItems
+reads the values one per line and verifies them while main iterates over them, a window of values ahead
+on the pool of threads. So the memory stays the same for any number of values, but a failed value
+only raises its ValueError when main gets to it.
+'''
+
+import os
+import sys
+import time
+import queue
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+###############################################################################
+
+FILESYSTEM_WIDGETS = ['file', 'dir', 'fileordir']
+
+
+class VerifyCache:
+
+    def __init__(self, func, size=256, check_stat=False):
+        self.func = func
+        self.size = size
+        self.check_stat = check_stat
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __call__(self, value):
+        try:
+            hash(value)
+        except TypeError:
+            return self.func(value)
+
+        state = get_state(value) if self.check_stat else None
+        with self.lock:
+            entry = self.entries.get(value)
+            if entry is not None and entry[0] == state:
+                self.entries.move_to_end(value)
+                return unpack(entry)
+
+        # verify outside of the lock, so other values can be checked meanwhile
+        try:
+            entry = (state, self.func(value), None)
+        except Exception as e:
+            entry = (state, None, e)
+
+        with self.lock:
+            self.entries[value] = entry
+            self.entries.move_to_end(value)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return unpack(entry)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def verify_items(func, values, workers=8, timeout=None):
+    '''Verify every value with func, using up to workers threads.
+
+    Returns the list of results in the order of values. Once every value is done, a ValueError
+    listing all values that failed or took longer than timeout seconds is raised, if there are any.
+    With workers <= 1 the values are verified one after the other in the calling thread, where a value
+    taking longer than timeout can't be given up on, it still fails once it is done.
+    '''
+    values = list(values)
+    errors = {}
+    results = [None] * len(values)
+
+    if workers <= 1 or len(values) <= 1 and timeout is None:
+        for index, value in enumerate(values):
+            start = time.monotonic()
+            try:
+                results[index] = func(value)
+            except Exception as e:
+                errors[index] = str(e)
+                continue
+            if timeout is not None and time.monotonic() - start > timeout:
+                errors[index] = "%r took longer than %s seconds to verify" % (value, timeout)
+        return check_errors(values, results, errors)
+
+    if timeout is None:
+        # a few chunks per thread, so the threads stay busy without a future per value
+        size = -(-len(values) // (workers * 4))
+        starts = range(0, len(values), size)
+        executor = ThreadPoolExecutor(max_workers=min(workers, len(starts)))
+        try:
+            futures = [executor.submit(verify_all, func, values[start:start + size]) for start in starts]
+            for start, future in zip(starts, futures):
+                chunk_results, chunk_errors = future.result()
+                results[start:start + len(chunk_results)] = chunk_results
+                for offset, error in chunk_errors:
+                    errors[start + offset] = error
+        finally:
+            executor.shutdown(wait=False)
+        return check_errors(values, results, errors)
+
+    # a daemon thread per value and at most workers of them counted as running, a pool would keep
+    # its threads taken by values given up on and never start the rest
+    finished = queue.Queue()
+
+    def run(index, value):
+        try:
+            finished.put((index, func(value), None))
+        except Exception as e:
+            finished.put((index, None, str(e)))
+
+    deadlines = {}
+    next_index = 0
+    while next_index < len(values) or deadlines:
+        while next_index < len(values) and len(deadlines) < workers:
+            deadlines[next_index] = time.monotonic() + timeout
+            threading.Thread(target=run, args=(next_index, values[next_index]), daemon=True).start()
+            next_index += 1
+
+        # wake up when the first running value exceeds its timeout
+        try:
+            index, result, error = finished.get(timeout=max(0, min(deadlines.values()) - time.monotonic()))
+        except queue.Empty:
+            pass
+        else:
+            # a value given up on may still finish later
+            if deadlines.pop(index, None) is not None:
+                results[index] = result
+                if error is not None:
+                    errors[index] = error
+
+        now = time.monotonic()
+        for index, deadline in list(deadlines.items()):
+            if deadline <= now:
+                del deadlines[index]
+                errors[index] = "%r took longer than %s seconds to verify" % (values[index], timeout)
+    return check_errors(values, results, errors)
+
+
+class StreamedItems:
+
+    def __init__(self, func, source, workers=8, timeout=None):
+        if source != '-' and not os.path.isfile(source):
+            raise ValueError("%r is no list file" % source)
+        self.func = func
+        self.source = source
+        self.workers = workers
+        self.timeout = timeout
+        self.used = False
+
+    def __iter__(self):
+        # a list file is read again for every iteration, stdin only once
+        if self.source != '-':
+            return stream_items(self.func, read_lines(self.source), self.workers, self.timeout)
+        if sys.stdin is None:
+            raise ValueError("there is no stdin to read the values from")
+        if self.used:
+            raise ValueError("the values from stdin can only be read once")
+        self.used = True
+        return stream_items(self.func, strip_lines(sys.stdin), self.workers, self.timeout)
+
+    def __repr__(self):
+        return "StreamedItems(%r)" % self.source
+
+
+def stream_source(values):
+    # the list file or '-' for stdin if the values are to be streamed, else None
+    if len(values) != 1 or not isinstance(values[0], str):
+        return None
+    value = values[0]
+    if value == '-':
+        return value
+    if value.startswith('@') and len(value) > 1:
+        return value[1:]
+    return None
+
+
+def stream_items(func, values, workers=8, timeout=None, chunk_size=64):
+    '''Yield func(value) for every value in order, verifying a few chunks of values per worker ahead.
+
+    The first value that fails or takes longer than timeout seconds to verify raises a ValueError.
+    '''
+    if workers <= 1:
+        for value in values:
+            try:
+                yield func(value)
+            except Exception as e:
+                raise ValueError(str(e))
+        return
+
+    # values are handed to the threads in chunks, unless each of them has its own timeout
+    if timeout is not None:
+        chunk_size = 1
+    window = workers * 2
+    pending = deque()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for chunk in split_chunks(values, chunk_size):
+            pending.append((chunk, executor.submit(verify_chunk, func, chunk)))
+            if len(pending) >= window:
+                yield from take_results(pending.popleft(), timeout)
+        while pending:
+            yield from take_results(pending.popleft(), timeout)
+    finally:
+        # main stopped iterating early or a value failed
+        for chunk, future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def split_chunks(values, size):
+    chunk = []
+    for value in values:
+        chunk.append(value)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def verify_all(func, chunk):
+    # results of all values of the chunk and the errors of those that failed by their offset
+    results = []
+    errors = []
+    for offset, value in enumerate(chunk):
+        try:
+            results.append(func(value))
+        except Exception as e:
+            results.append(None)
+            errors.append((offset, str(e)))
+    return results, errors
+
+
+def verify_chunk(func, chunk):
+    # results of the values up to the first that failed and its error
+    results = []
+    for value in chunk:
+        try:
+            results.append(func(value))
+        except Exception as e:
+            return results, str(e)
+    return results, None
+
+
+def take_results(item, timeout):
+    chunk, future = item
+    try:
+        results, error = future.result(timeout)
+    except TimeoutError:
+        raise ValueError("%r took longer than %s seconds to verify" % (chunk[0], timeout))
+    yield from results
+    if error is not None:
+        raise ValueError(error)
+
+
+def read_lines(path):
+    with open(path, encoding='utf-8', errors='surrogateescape') as lines:
+        yield from strip_lines(lines)
+
+
+def strip_lines(lines):
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def check_errors(values, results, errors):
+    if errors:
+        raise ValueError('\n'.join([errors[index] for index in sorted(errors)]))
+    return results
+
+
+def unpack(entry):
+    state, result, error = entry
+    if error is not None:
+        raise error.with_traceback(None)
+    return result
+
+
+def get_state(value):
+    # time of the last modification, size and identity of a path, or None if it doesn't exist
+    if not isinstance(value, str):
+        return None
+    # a path found by fswalk keeps the directory entry, which caches its status
+    entry = getattr(value, 'entry', None)
+    try:
+        status = entry.stat() if entry is not None else os.stat(value)
+    except (OSError, ValueError):
+        return None
+    return status.st_mtime_ns, status.st_size, status.st_ino